@@ -0,0 +1,57 @@
+"""
+Benchmark for the timezone autocomplete handlers
+
+Replays every keystroke of typing a set of timezones, comparing the
+prebuilt SearchIndex against the previous lowercase-and-scan approach.
+
+Usage: python -m bench.autocomplete [rounds]
+"""
+import sys
+import time
+
+from src import constants
+from src.search import SearchIndex
+
+TARGETS = ['Australia/Sydney', 'America/New_York', 'Europe/London', 'Asia/Kolkata', 'Pacific/Auckland']
+
+
+def keystrokes():
+    """Every prefix typed on the way to each target"""
+    return [target[:i] for target in TARGETS for i in range(len(target) + 1)]
+
+
+def linear_search(query: str):
+    """The previous get_country_timezones, without a country"""
+    query = query.lower()
+    return [tz for tz in constants.TZ_ALL if query in tz.lower()][:25]
+
+
+def bench(func, queries: list[str], rounds: int):
+    """Seconds per keystroke taken by func"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in queries:
+            func(query)
+    return (time.perf_counter() - start) / (rounds * len(queries))
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    queries = keystrokes()
+
+    start = time.perf_counter()
+    index = SearchIndex(constants.TZ_ALL)
+    build = time.perf_counter() - start
+
+    baseline = bench(linear_search, queries, rounds)
+    uncached = bench(index._search, queries, rounds)
+    cached = bench(index.search, queries, rounds)
+
+    print(f'Index of {len(index)} timezones built in {build * 1e3:.2f}ms')
+    print(f'Linear scan:      {baseline * 1e6:.1f}us per keystroke')
+    print(f'Index (uncached): {uncached * 1e6:.1f}us per keystroke ({baseline / uncached:.1f}x faster)')
+    print(f'Index (cached):   {cached * 1e6:.1f}us per keystroke ({baseline / cached:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+Offline throughput benchmark for reminder dispatch
+
+Seeds a local MongoDB with reminders due over a short window, then drives
+the real scheduler, claim queries and ReminderDispatcher against a fake
+Discord layer. Reports throughput, dispatch lag and database operation
+counts as JSON so results can be compared between runs.
+
+Requires a disposable MongoDB, e.g. `docker run -p 27017:27017 mongo`.
+
+Usage: python -m bench.dispatch --reminders 100000 --guilds 100 --channels 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+
+from pymongo import monitoring
+
+parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+parser.add_argument('--reminders', type=int, default=10_000, help='number of reminders to seed')
+parser.add_argument('--guilds', type=int, default=100, help='number of guilds')
+parser.add_argument('--channels', type=int, default=5, help='channels per guild')
+parser.add_argument('--authors', type=int, default=50, help='authors per guild')
+parser.add_argument('--window', type=int, default=60, help='seconds over which reminders fall due')
+parser.add_argument('--recurring', type=float, default=0.0, help='fraction of recurring reminders')
+parser.add_argument('--send-latency', type=float, default=0.05, help='seconds per fake channel.send')
+parser.add_argument('--coalesce', action='store_true', help='enable coalescing in every guild')
+parser.add_argument('--no-rate-limit', action='store_true', help="disable the dispatcher's rate limits")
+parser.add_argument('--mongodb-url', default=os.getenv('BENCH_MONGODB_URL', 'mongodb://localhost:27017'))
+parser.add_argument('--output', help='also write the JSON results to this file')
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts database commands by name"""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def started(self, event):
+        self.counts[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class FakePermissions:
+    mention_everyone = False
+
+
+class FakeMember:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.display_name = f'user{user_id}'
+
+    async def send(self, content: str):
+        pass
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.name = f'guild{guild_id}'
+
+    def get_member(self, user_id: int):
+        # Force every author through the resolver's bulk lookup
+        return None
+
+    async def query_members(self, user_ids: list[int], limit: int, cache: bool):
+        return [FakeMember(user_id) for user_id in user_ids]
+
+    async def fetch_member(self, user_id: int):
+        return FakeMember(user_id)
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int, guild: FakeGuild, latency: float, lags: list[float]):
+        self.id = channel_id
+        self.guild = guild
+        self.mention = f'<#{channel_id}>'
+        self.latency = latency
+        self.lags = lags
+
+    def permissions_for(self, member: FakeMember):
+        return FakePermissions()
+
+    async def send(self, content: str, allowed_mentions=None):
+        await asyncio.sleep(self.latency)
+        # Seeded reminder text is the time it was due, and coalesced messages hold several
+        now = time.time()
+        for line in content.split('\n'):
+            if line.startswith('> '):
+                self.lags.append(now - float(line[2:]))
+
+
+class FakeBot:
+    def __init__(self, guilds: dict[int, FakeGuild], channels: dict[int, FakeChannel]):
+        self.guilds = guilds
+        self.channels = channels
+
+    def get_guild(self, guild_id: int):
+        return self.guilds.get(guild_id)
+
+    def get_channel(self, channel_id: int):
+        return self.channels.get(channel_id)
+
+
+def seed(data, args, start: int):
+    """Insert the configured reminders, returning the fake guilds and channels"""
+    from src.data import new_id
+    from src.models.reminder import Reminder
+
+    lags: list[float] = []
+    guilds = {}
+    channels = {}
+    for g in range(args.guilds):
+        guild = guilds[g + 1] = FakeGuild(g + 1)
+        for c in range(args.channels):
+            channel_id = (g + 1) * 1000 + c
+            channels[channel_id] = FakeChannel(channel_id, guild, args.send_latency, lags)
+
+    docs = []
+    for _ in range(args.reminders):
+        guild_id = random.randint(1, args.guilds)
+        due = start + random.uniform(0, args.window)
+        reminder = Reminder(
+            text=f'{due}',
+            author_id=guild_id * 1000 + random.randrange(args.authors),
+            guild_id=guild_id,
+            channel_id=guild_id * 1000 + random.randrange(args.channels),
+            time=int(due),
+            interval='1 day' if random.random() < args.recurring else None,
+            id=new_id(),
+            timezone='UTC'
+        )
+        docs.append(reminder.to_dict())
+    for i in range(0, len(docs), 10_000):
+        data.db.reminders.insert_many(docs[i:i + 10_000], ordered=False)
+
+    return FakeBot(guilds, channels), lags
+
+
+async def run(args, counter: CommandCounter):
+    from src import dispatch
+    from src.data import data
+    from src.scheduler import ReminderScheduler
+
+    data.db.reminders.drop()
+    data.db.guilds.drop()
+    data.db.meta.drop()
+    await data.ensure_indexes()
+
+    start = int(time.time()) + 2
+    bot, lags = seed(data, args, start)
+    if args.coalesce:
+        for guild_id in bot.guilds:
+            await data.set_coalesce(guild_id, True)
+    await data.warm_settings(list(bot.guilds))
+
+    if args.no_rate_limit:
+        dispatch.GLOBAL_RATE = dispatch.CHANNEL_RATE = (10 ** 9, 1)
+    dispatcher = dispatch.ReminderDispatcher(bot)
+    scheduler = ReminderScheduler()
+    data.insert_listeners.append(scheduler.notify)
+
+    counter.counts.clear()
+    began = time.perf_counter()
+    busy = 0.0
+    handled = 0
+    while handled < args.reminders:
+        await scheduler.wait()
+        result = await dispatcher.dispatch_due()
+        handled += len(result.completed) + len(result.rescheduled)
+        busy += result.elapsed
+        for retry_time in result.retry_times:
+            scheduler.schedule(retry_time)
+    elapsed = time.perf_counter() - began
+
+    data.db.client.drop_database(data.db.name)
+
+    quantiles = statistics.quantiles(lags, n=100) if len(lags) > 1 else [0] * 99
+    return {
+        'config': {k: v for k, v in vars(args).items() if k not in ('mongodb_url', 'output')},
+        'sent': len(lags),
+        'elapsed': round(elapsed, 3),
+        # Time spent dispatching, excluding waits for reminders to fall due
+        'busy': round(busy, 3),
+        'throughput': round(len(lags) / busy, 1) if busy else 0.0,
+        'lag_p50': round(quantiles[49], 3),
+        'lag_p99': round(quantiles[98], 3),
+        'lag_max': round(max(lags, default=0), 3),
+        'db_ops': dict(counter.counts),
+        'db_ops_per_reminder': round(sum(counter.counts.values()) / max(len(lags), 1), 3),
+    }
+
+
+def main():
+    args = parser.parse_args()
+
+    # Must be configured before src.data creates its client
+    os.environ['MONGODB_URL'] = args.mongodb_url
+    os.environ['MONGODB_DB'] = 'reminderbot_bench'
+    counter = CommandCounter()
+    monitoring.register(counter)
+
+    results = asyncio.run(run(args, counter))
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
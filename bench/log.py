@@ -0,0 +1,80 @@
+"""
+Benchmark for logging in the dispatch loop
+
+Compares the time the event loop spends logging each dispatched reminder
+with the original prints, buffered or not, against the queued, sampled structured logger.
+Output goes to a file, as it does when stdout is captured in production.
+
+Usage: python -m bench.log [reminders]
+"""
+import asyncio
+import contextlib
+import logging
+import sys
+import tempfile
+import time
+
+from src import log
+
+DOC = {
+    '_id': 'abc234', 'text': 'Submit the weekly report before the standup ' * 3,
+    'author_id': 123456789012345678, 'guild_id': 234567890123456789,
+    'channel_id': 345678901234567890, 'time': 1700000000, 'interval': None
+}
+
+
+async def legacy(reminders: int):
+    """Original per reminder prints"""
+    for _ in range(reminders):
+        print("Retrieved reminder:", DOC)
+        print("Executing...")
+        print("Success")
+        await asyncio.sleep(0)
+
+
+async def structured(reminders: int):
+    """Per reminder event as logged by the dispatcher"""
+    fields = {'reminder': DOC['_id'], 'guild': DOC['guild_id'], 'channel': DOC['channel_id']}
+    for _ in range(reminders):
+        log.events.debug('Reminder sent', **fields, lag=0.25)
+        await asyncio.sleep(0)
+
+
+def bench(func, reminders: int):
+    """Seconds of event loop time per reminder taken by func"""
+    start = time.perf_counter()
+    asyncio.run(func(reminders))
+    return (time.perf_counter() - start) / reminders
+
+
+def main():
+    reminders = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    # Hosts that run with PYTHONUNBUFFERED write every line straight out
+    with tempfile.TemporaryFile('w', buffering=1) as out, contextlib.redirect_stdout(out):
+        unbuffered = bench(legacy, reminders)
+
+    with tempfile.TemporaryFile('w') as out:
+        with contextlib.redirect_stdout(out):
+            baseline = bench(legacy, reminders)
+
+        log.setup_logging(out)
+        logging.getLogger('src').setLevel(logging.INFO)
+        disabled = bench(structured, reminders)
+
+        logging.getLogger('src').setLevel(logging.DEBUG)
+        sampled = bench(structured, reminders)
+
+        log.events.rate = 1
+        full = bench(structured, reminders)
+        log.shutdown_logging()
+
+    print(f'print, unbuffered:       {unbuffered * 1e6:.2f}us per reminder')
+    print(f'print, buffered:         {baseline * 1e6:.2f}us per reminder')
+    print(f'structured, disabled:    {disabled * 1e6:.2f}us per reminder')
+    print(f'structured, 1% sampled:  {sampled * 1e6:.2f}us per reminder')
+    print(f'structured, all events:  {full * 1e6:.2f}us per reminder')
+
+
+if __name__ == '__main__':
+    main()
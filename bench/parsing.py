@@ -0,0 +1,53 @@
+"""
+Benchmark for parsing.str_to_datetime
+
+Replays a mix of common and long tail DateTimeModal inputs, comparing the
+fast path and memo cache against calling dateparser for every input.
+
+Usage: python -m bench.parsing [rounds]
+"""
+import sys
+import time
+
+from src import parsing
+
+TIMEZONE = 'Australia/Sydney'
+
+# Roughly what users type into the date and time fields
+INPUTS = [
+    'tomorrow 8pm', 'tmrw 9am', 'today 5:30pm', 'friday 10am', 'monday 9:00am',
+    '26/05/2030 13:37', '1/1 12am', '25 dec 2030 at 7:00 am', 'tomorrow', '3rd june 6pm',
+    # Long tail handled by dateparser
+    'in 2 hours', 'next friday at noon', 'end of month', 'may 26th 2030 8pm',
+]
+
+
+def bench(func, rounds: int):
+    """Seconds per input taken by func over the input mix"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for string in INPUTS:
+            func(string, TIMEZONE)
+    return (time.perf_counter() - start) / (rounds * len(INPUTS))
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    fast = sum(parsing.fast_parse(parsing.normalise_datetime(s), TIMEZONE) is not None for s in INPUTS)
+    print(f'Fast path coverage: {fast}/{len(INPUTS)} inputs')
+
+    baseline = bench(
+        lambda s, tz: parsing.dateparser_parse(parsing.normalise_datetime(s), tz), rounds)
+    parsing._cached_fast_parse.cache_clear()
+    current = bench(parsing.str_to_datetime, rounds)
+
+    info = parsing._cached_fast_parse.cache_info()
+    hit_rate = info.hits / (info.hits + info.misses) if info.hits + info.misses else 0
+    print(f'Memo cache hit rate: {hit_rate:.1%} ({info.hits} hits, {info.misses} misses)')
+    print(f'dateparser only: {baseline * 1e6:.1f}us per input')
+    print(f'str_to_datetime: {current * 1e6:.1f}us per input ({baseline / current:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark for loading reminders from the database
+
+Decodes BSON for a large result set and materializes Reminders from it,
+comparing the original dict backed class and per document from_dict against
+the slotted class and bulk from_dicts. Reports throughput, and the memory
+held by the materialized reminders.
+
+Usage: python -m bench.reminder [documents]
+"""
+import gc
+import sys
+import time
+import tracemalloc
+
+import bson
+
+from src.data import new_id
+from src.models.reminder import Reminder
+
+
+class LegacyReminder:
+    """Reminder as it was before it was slotted"""
+
+    def __init__(self, text='', author_id=0, guild_id=0, channel_id=0, time=0, interval='', id=None):
+        self.text = text
+        self.author_id = author_id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.time = time
+        self.interval = interval
+        self.id = id
+
+    @classmethod
+    def from_dict(cls, dic: dict):
+        return LegacyReminder(
+            text=dic['text'],
+            author_id=dic['author_id'],
+            guild_id=dic['guild_id'],
+            channel_id=dic['channel_id'],
+            time=dic['time'],
+            interval=dic['interval'],
+            id=dic.get('_id')
+        )
+
+
+def legacy(docs):
+    return [LegacyReminder.from_dict(doc) for doc in docs]
+
+
+def slotted(docs):
+    return [Reminder.from_dict(doc) for doc in docs]
+
+
+def bulk(docs):
+    return Reminder.from_dicts(docs)
+
+
+def documents(count: int) -> bytes:
+    """BSON for a result set of reminders as stored in the database"""
+    return b''.join(bson.encode(Reminder(
+        text=f'Reminder number {i}',
+        author_id=100000000000000000 + i % 500,
+        guild_id=200000000000000000 + i % 50,
+        channel_id=300000000000000000 + i % 200,
+        time=1700000000 + i,
+        interval='1 week' if i % 4 == 0 else None,
+        id=new_id(),
+        timezone='UTC'
+    ).to_dict()) for i in range(count))
+
+
+def bench(load, raw: bytes):
+    """Seconds to decode and materialize, and bytes held by the reminders alone"""
+    docs = bson.decode_all(raw)
+    start = time.perf_counter()
+    load(bson.decode_all(raw))
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    reminders = load(docs)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del reminders
+    return elapsed, size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    raw = documents(count)
+
+    start = time.perf_counter()
+    bson.decode_all(raw)
+    decode = time.perf_counter() - start
+    print(f'BSON decode alone: {decode * 1e3:.1f}ms for {count} documents')
+
+    for name, load in (('legacy', legacy), ('slotted', slotted), ('slotted, bulk', bulk)):
+        elapsed, size = bench(load, raw)
+        print(f'{name:<14} {count / elapsed:>10,.0f} docs/s  '
+              f'{(elapsed - decode) * 1e3:6.1f}ms materializing  {size / count:5.0f} bytes/reminder')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,13 +2,28 @@
 The Reminder Bot bot client
 """
 import asyncio
+import logging
+import os
 
 import discord
 from discord.ext import tasks
+from pymongo.errors import PyMongoError
 
 from src.data import data
+from src.dispatch import ReminderDispatcher
+from src.metrics import metrics
 from src.models.list import ReminderList
 from src.models.prompt import ReminderPrompt
+from src.models.registry import SessionRegistry
+from src.scheduler import ReminderScheduler
+from src.startup import timer
+
+log = logging.getLogger(__name__)
+
+# Attempts to reach the database at startup, waiting CONNECT_DELAY seconds
+# after the first failure and doubling each time, before giving up
+CONNECT_ATTEMPTS = 6
+CONNECT_DELAY = 2
 
 
 async def valid_channel_type(ctx: discord.ApplicationContext):
@@ -25,10 +40,14 @@ class ReminderBot(discord.Bot):
         super().__init__(*args, **kwargs)
         self.allowed_mentions = discord.AllowedMentions.none()
 
-        self.prompts: list[ReminderPrompt] = []
-        self.promptsLock = asyncio.Lock()
-        self.lists: list[ReminderList] = []
-        self.listsLock = asyncio.Lock()
+        self.prompts: SessionRegistry[ReminderPrompt] = SessionRegistry()
+        self.lists: SessionRegistry[ReminderList] = SessionRegistry()
+        metrics.open_sessions.track(lambda: len(self.prompts), kind='prompt')
+        metrics.open_sessions.track(lambda: len(self.lists), kind='list')
+
+        self.scheduler = ReminderScheduler()
+        data.insert_listeners.append(self.scheduler.notify)
+        self.dispatcher = ReminderDispatcher(self)
 
         from src.cogs.reminders import RemindersCog
         self.add_cog(RemindersCog(self))
@@ -43,9 +62,53 @@ class ReminderBot(discord.Bot):
 
         self.execute_reminders.start()
 
+    async def start(self, *args, **kwargs):
+        """Connect to the database while logging in to Discord"""
+        self.database_ready = asyncio.create_task(self.connect_database())
+        if os.getenv('METRICS_PORT'):
+            await metrics.serve(int(os.getenv('METRICS_PORT')), os.getenv('METRICS_HOST', '127.0.0.1'))
+        timer.begin('gateway')
+        await super().start(*args, **kwargs)
+
+    async def connect_database(self):
+        """
+        Connect to the database, timing it as a startup phase
+
+        If it can't be reached after retrying, the bot is closed so the
+        process exits and can be restarted, instead of running without
+        ever delivering reminders.
+        """
+        with timer.phase('database'):
+            for attempt in range(1, CONNECT_ATTEMPTS + 1):
+                try:
+                    await data.connect()
+                    return
+                except PyMongoError as e:
+                    if attempt == CONNECT_ATTEMPTS:
+                        log.critical('Could not connect to MongoDB after %d attempts, shutting down', attempt)
+                        await self.close()
+                        raise
+
+                    delay = CONNECT_DELAY * 2 ** (attempt - 1)
+                    log.warning('Could not connect to MongoDB, retrying in %ds', delay, extra={'fields': {
+                        'attempt': attempt, 'error': e}})
+                    await asyncio.sleep(delay)
+
+    async def close(self):
+        """Stop dispatching, releasing any reminders claimed but not sent, then disconnect"""
+        task = self.execute_reminders.get_task()
+        self.execute_reminders.cancel()
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+        await super().close()
+
     async def on_ready(self):
-        """Log when ready"""
-        print(f'Logged on as {self.user}!')
+        """Warm the settings cache and log when ready"""
+        timer.end('gateway')
+        await self.database_ready
+        with timer.phase('settings'):
+            await data.warm_settings([guild.id for guild in self.guilds])
+        log.info('Logged on as %s', self.user)
     
     async def on_application_command_error(
         self,
@@ -53,8 +116,8 @@ class ReminderBot(discord.Bot):
         error: discord.DiscordException
     ):
         """Global error handler"""
-        print(f"Error occurred with /{ctx.command.qualified_name}", ctx.selected_options)
-        print(f"    {error}")
+        log.error('Error occurred with /%s', ctx.command.qualified_name, extra={'fields': {
+            'options': ctx.selected_options, 'error': error}})
         await ctx.respond(
             f"**Error:** {error}\n"
             "If this seems like unintended behaviour, please contact me (`@marshdapro`) "
@@ -62,52 +125,40 @@ class ReminderBot(discord.Bot):
             ephemeral=True
         )
 
-    @tasks.loop(minutes=1)
+    @tasks.loop(seconds=0)
     async def execute_reminders(self):
-        """Execute all reminders that are in this minute"""
-        for reminder in data.current_reminders():
-            # Ensure still in guild
-            guild = self.get_guild(reminder.guild_id)
-            if not guild:
-                print("Guild not found, continuing")
-                data.remove_guild(reminder.guild_id)
-                continue
-
-            # Find target channel and check it exists
-            channel_id = data.get_target(reminder.guild_id) or reminder.channel_id
-            channel = self.get_channel(channel_id)
-            if channel is None:
-                print("Channel not found, continuing")
-                continue
-                
-            # Check if author still in guild
-            try:
-                author = guild.get_member(reminder.author_id) or await guild.fetch_member(reminder.author_id)
-            except discord.errors.NotFound:
-                author = None
-            if author is None:
-                print("Author not found, continuing")
-                continue
-
-            try:
-                print("Executing...")
-                await reminder.execute(channel, author)
-                print("Success")
-            except discord.errors.Forbidden:
-                print("Failed")
-                await reminder.failure(channel, author)
-            except discord.errors.DiscordServerError:
-                print("Discord server error - waiting till next minute")
-                break
-
-            if reminder.interval:
-                tz = data.get_timezone(reminder.guild_id)
-                data.add_reminder(reminder.generate_repeat(tz))
-
-            await asyncio.sleep(1/25)
+        """Wait until reminders are due, then execute all of them"""
+        await self.scheduler.wait()
+
+        result = await self.dispatcher.dispatch_due()
+        metrics.tick_seconds.observe(result.elapsed)
+        for retry_time in result.retry_times:
+            self.scheduler.schedule(retry_time)
+        sent = len(result.completed) + len(result.rescheduled)
+        if sent:
+            log.info('Dispatched %d reminders in %.2fs (%.1f/s)', sent, result.elapsed, sent / result.elapsed)
 
     @execute_reminders.before_loop
     async def before_my_task(self):
         """Wait until ready before executing reminders"""
         await self.wait_until_ready()
-        data.ping()
+        await self.database_ready
+        with timer.phase('indexes'):
+            await data.ensure_indexes()
+            if data.shard_query:
+                await data.backfill_shard_keys()
+        timer.report()
+
+
+class ShardedReminderBot(ReminderBot, discord.AutoShardedBot):
+    """
+    Reminder bot client running several shards in one process
+
+    If shard_ids is given, only reminders of guilds on those shards are
+    scheduled, so other processes can run the remaining shards.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.shard_ids is not None:
+            data.set_shards(self.shard_count, self.shard_ids)
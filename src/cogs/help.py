@@ -4,6 +4,8 @@ Cog that implements the modular help command
 import discord
 from discord.ext import commands
 
+from src.search import SearchIndex
+
 
 def cog_commands(cog: discord.Cog):
     """Returns all commands of a cog (not groups)"""
@@ -12,23 +14,7 @@ def cog_commands(cog: discord.Cog):
 
 def help_autocomplete(ctx: discord.AutocompleteContext):
     """Autocomplete with all cogs and commands"""
-
-    # Gather all cogs and commands starting with input
-    inp = ctx.value.lower()
-    result = []
-    for cog in ctx.bot.cogs:
-        # Any cog
-        if cog.lower().startswith(inp):
-            result.append(cog)
-
-        # Any command that starts with input or input without slash
-        for command in cog_commands(ctx.bot.cogs[cog]):
-            command_name = command.qualified_name.lower()
-            if command_name.startswith(inp) or \
-                    (inp.startswith('/') and command_name.startswith(inp[1:])):
-                result.append(f'/{command.qualified_name}')
-
-    return result
+    return ctx.command.cog.search_index().search(ctx.value)
 
 
 class HelpCog(commands.Cog, name='Other'):
@@ -38,6 +24,17 @@ class HelpCog(commands.Cog, name='Other'):
 
     def __init__(self, bot: discord.Bot):
         self.bot = bot
+        self._index: SearchIndex | None = None
+
+    def search_index(self):
+        """Index of all cogs and commands, built once every cog has been added"""
+        if self._index is None:
+            names = []
+            for cog in self.bot.cogs:
+                names.append(cog)
+                names.extend(f'/{command.qualified_name}' for command in cog_commands(self.bot.cogs[cog]))
+            self._index = SearchIndex(names)
+        return self._index
 
     @commands.slash_command()
     @discord.option('topic', str, required=False, autocomplete=help_autocomplete,
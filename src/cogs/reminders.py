@@ -4,13 +4,19 @@ Cog for setting and removing reminders
 import discord
 from discord.ext import commands
 
-from src import constants
+from src import constants, recurrence
 from src.bot import ReminderBot
 from src.models.prompt import ReminderPrompt
 from src.models.reminder import Reminder
 from src.models.list import ReminderList
 from src.data import data
 
+# Number of firings shown by /upcoming
+UPCOMING_LIMIT = 10
+
+# Reminder text is cut short in /upcoming to keep the embed within limits
+UPCOMING_TEXT_LENGTH = 100
+
 
 class RemindersCog(commands.Cog, name='Reminders'):
     """
@@ -24,101 +30,130 @@ class RemindersCog(commands.Cog, name='Reminders'):
     @discord.option("reminder", type=str, description="Enter your reminder", required=True)
     async def set(self, ctx: discord.ApplicationContext, reminder: str):
         """Set a new reminder"""
-        # See if user currently has a prompt open
-        async with self.bot.promptsLock:
-            for prompt in self.bot.prompts:
-                if prompt.ctx.author == ctx.author:
-                    await ctx.respond(
-                        "You are already setting a reminder, finish that one first!",
-                        ephemeral=True
-                    )
-                    return
+        async with self.bot.prompts.lock(ctx.author.id):
+            # See if user currently has a prompt open
+            if self.bot.prompts.get(ctx.author.id):
+                await ctx.respond(
+                    "You are already setting a reminder, finish that one first!",
+                    ephemeral=True
+                )
+                return
 
             # Open a new prompt
-            timezone = data.get_timezone(ctx.guild_id)
+            timezone = await data.get_timezone(ctx.guild_id)
             prompt = ReminderPrompt(ctx, reminder, timezone)
-            self.bot.prompts.append(prompt)
+            self.bot.prompts.add(ctx.author.id, prompt)
 
         # Set a reminder with completed prompt
-        res = await prompt.run()
-        async with self.bot.promptsLock:
-            self.bot.prompts.remove(prompt)
+        try:
+            await prompt.open()
+            self.bot.prompts.bind(ctx.author.id, prompt.message.id)
+            res = await prompt.wait()
+        finally:
+            self.bot.prompts.remove(ctx.author.id, prompt)
         if not res and not prompt.cancelled:
-            data.add_reminder(Reminder.from_prompt(prompt))
+            await data.add_reminder(Reminder.from_prompt(prompt))
 
     @commands.Cog.listener('on_message_delete')
     async def prompt_deletion(self, message: discord.Message):
         """Listen for prompt deletion"""
-        async with self.bot.promptsLock:
-            for prompt in self.bot.prompts:
-                if prompt.message.id == message.id:
-                    prompt.cancelled = True
-                    prompt.view_.stop()
+        prompt = self.bot.prompts.from_message(message.id)
+        if prompt is None:
+            return
+
+        prompt.cancelled = True
+        prompt.view_.stop()
 
     @commands.slash_command()
     async def list(self, ctx: discord.ApplicationContext):
         """List all reminders"""
-        async with self.bot.listsLock:
-            for list_ in self.bot.lists:
-                if list_.ctx.author == ctx.author:
-                    try:
-                        await list_.close()
-                    except discord.errors.DiscordException:
-                        pass
+        async with self.bot.lists.lock(ctx.author.id):
+            old_list = self.bot.lists.get(ctx.author.id)
+            if old_list:
+                try:
+                    await old_list.close()
+                except discord.errors.DiscordException:
+                    pass
 
             # Open a new list
-            list_ = ReminderList(ctx, data.guild_reminders(ctx.guild_id))
-            self.bot.lists.append(list_)
-        await list_.respond(ctx.interaction)
+            list_ = ReminderList(ctx)
+            self.bot.lists.add(ctx.author.id, list_)
+
+        try:
+            await list_.respond(ctx.interaction)
+            self.bot.lists.bind(ctx.author.id, list_.message.id)
 
-        # After list is done
-        await list_.wait()
-        async with self.bot.listsLock:
-            self.bot.lists.remove(list_)
+            # After list is done
+            await list_.wait()
+        finally:
+            self.bot.lists.remove(ctx.author.id, list_)
 
     @commands.Cog.listener('on_message_delete')
     async def list_deletion(self, message: discord.Message):
         """Listen for list deletion"""
-        async with self.bot.listsLock:
-            for list_ in self.bot.lists:
-                if list_.message and list_.message.id == message.id:
-                    list_.stop()
+        list_ = self.bot.lists.from_message(message.id)
+        if list_ is not None:
+            list_.stop()
 
     @commands.slash_command()
-    @discord.option("id", type=int, description="ID of reminder to remove",
-                    min_value=1, required=True)
-    async def remove(self, ctx: discord.ApplicationContext, _id: int):
-        """Remove a reminder (use /list to get the reminder ID)"""
+    async def upcoming(self, ctx: discord.ApplicationContext):
+        """Show the next times this server's repeating reminders will go off"""
+        reminders = await data.next_recurring(ctx.guild_id, UPCOMING_LIMIT)
+        timezone = await data.get_timezone(ctx.guild_id)
+        firings = recurrence.upcoming(reminders, timezone, UPCOMING_LIMIT)
+
+        if firings:
+            lines = []
+            for time, reminder in firings:
+                text = reminder.text
+                if len(text) > UPCOMING_TEXT_LENGTH:
+                    text = text[:UPCOMING_TEXT_LENGTH - 3] + '...'
+                lines.append(f'<t:{time}:f> (<t:{time}:R>) **`{reminder.id}`:** _"{text}"_ for <@!{reminder.author_id}>')
+            content = '\n'.join(lines)
+        else:
+            content = 'Nothing to show here...'
 
-        reminders = data.guild_reminders(ctx.guild_id)
-        if len(reminders) < _id:
-            await ctx.respond('No reminder exists with that ID', ephemeral=True)
-            return
-        reminder = reminders[_id - 1]
+        embed = discord.Embed(
+            colour=constants.BLURPLE,
+            title='Upcoming Reminders',
+            description=content
+        )
+        embed.set_footer(text='Only repeating reminders are shown, use /list to see all reminders.')
+        await ctx.respond(embed=embed)
 
+    @commands.slash_command()
+    @discord.option("id", type=str, description="ID of reminder to remove",
+                    required=True)
+    async def remove(self, ctx: discord.ApplicationContext, _id: str):
+        """Remove a reminder (use /list to get the reminder ID)"""
+        # Managers can remove any reminder, everyone else only their own
         author = ctx.guild.get_member(ctx.author.id)
-        if author.id != reminder.author_id:
-            manager = data.get_role(ctx.guild_id)
-            if manager:
-                role = ctx.guild.get_role(manager)
-                if role not in author.roles:
-                    await ctx.respond(
-                        f"You must have the {role.mention} role to remove reminders that aren't yours!",
-                        ephemeral=True
-                    )
-                return
-            if not author.guild_permissions.manage_messages:
+        manager = await data.get_role(ctx.guild_id)
+        if manager:
+            is_manager = any(role.id == manager for role in author.roles)
+        else:
+            is_manager = author.guild_permissions.manage_messages
+
+        reminder = await data.remove_reminder_by_id(
+            ctx.guild_id, _id, author_id=None if is_manager else author.id)
+        if reminder is None:
+            if not await data.get_reminder(ctx.guild_id, _id):
+                await ctx.respond('No reminder exists with that ID', ephemeral=True)
+            elif manager:
+                await ctx.respond(
+                    f"You must have the <@&{manager}> role to remove reminders that aren't yours!",
+                    ephemeral=True
+                )
+            else:
                 await ctx.respond(
                     "You must have the `Manage Messages` permission to remove reminders that aren't yours!",
                     ephemeral=True
                 )
-                return
-
-        data.remove_reminder(reminder)
+            return
 
         embed = discord.Embed(
             colour=constants.RED,
             title='Reminder removed!',
-            description=f'**{_id}:** {reminder}'
+            description=f'**`{reminder.id}`:** {reminder}'
         )
         await ctx.respond(embed=embed)
@@ -7,21 +7,24 @@ from discord.ext import commands
 
 from src import constants
 from src.data import data
+from src.search import SearchIndex
+
+# Built once, as autocomplete runs on every keystroke
+COUNTRY_INDEX = SearchIndex(constants.TZ_COUNTRIES)
+TIMEZONE_INDEX = SearchIndex(constants.TZ_ALL)
+COUNTRY_TIMEZONE_INDEXES = {
+    country: SearchIndex(timezones) for country, timezones in constants.TZ_COUNTRIES.items()
+}
 
 
 async def get_countries(ctx: discord.AutocompleteContext):
-    inp = ctx.value.lower()
-    return [x for x in constants.TZ_COUNTRIES if x.lower().startswith(inp)]
+    return COUNTRY_INDEX.search(ctx.value)
 
 
 async def get_country_timezones(ctx: discord.AutocompleteContext):
-    inp = ctx.value.lower()
     country = ctx.options['country']
-    if country and country in constants.TZ_COUNTRIES:
-        country_timezones = constants.TZ_COUNTRIES[country]
-        return [tz for tz in country_timezones if inp in tz.lower()]
-
-    return [tz for tz in constants.TZ_ALL if inp in tz.lower()]
+    index = COUNTRY_TIMEZONE_INDEXES.get(country, TIMEZONE_INDEX)
+    return index.search(ctx.value)
 
 
 class SettingsCog(commands.Cog, name='Settings'):
@@ -38,13 +41,10 @@ class SettingsCog(commands.Cog, name='Settings'):
     @settings_group.command()
     async def view(self, ctx: discord.ApplicationContext):
         """See information on the settings for this server"""
-        timezone = data.get_timezone(ctx.guild_id)
-
-        target = data.get_target(ctx.guild_id)
-        target = f'<#{target}>' if target else '`None`'
-
-        role = data.get_role(ctx.guild_id)
-        role = f'<@&{role}>' if role else '`None`'
+        settings = await data.get_settings(ctx.guild_id)
+        timezone = settings.timezone
+        target = f'<#{settings.target}>' if settings.target else '`None`'
+        role = f'<@&{settings.role}>' if settings.role else '`None`'
 
         embed = {
             'color': constants.BLURPLE,
@@ -75,6 +75,24 @@ class SettingsCog(commands.Cog, name='Settings'):
                     f'Current Manager Role: {role}\n\n'
                     'Use `/settings role <@role>` to set a role.\n'
                     'Use `/settings role` to unset the manager role.\n\n'
+                    r'\_\_\_\_\_\_\_\_\_\_\_\_\_\_\_\_'
+        })
+        embed['fields'].append({
+            'name': 'Combine Reminders 📦',
+            'value': 'If enabled, reminders due at the same time in the same channel '
+                    'are sent together in as few messages as possible.\n\n'
+                    f'Currently: `{"Enabled" if settings.coalesce else "Disabled"}`\n\n'
+                    'Use `/settings combine <enabled>` to change this.\n\n'
+                    r'\_\_\_\_\_\_\_\_\_\_\_\_\_\_\_\_'
+        })
+        embed['fields'].append({
+            'name': 'Send Through Webhooks 🪝',
+            'value': 'If enabled, reminders are sent through a webhook in each channel, '
+                    'which keeps them flowing in busy channels. '
+                    'Requires the bot to have the `Manage Webhooks` permission, '
+                    'otherwise reminders are sent as normal.\n\n'
+                    f'Currently: `{"Enabled" if settings.webhook else "Disabled"}`\n\n'
+                    'Use `/settings webhook <enabled>` to change this.\n\n'
         })
 
         await ctx.respond(embed=discord.Embed.from_dict(embed))
@@ -95,7 +113,7 @@ class SettingsCog(commands.Cog, name='Settings'):
             return
         
         if timezone in constants.TZ_ALL:
-            data.set_timezone(ctx.guild_id, timezone)
+            await data.set_timezone(ctx.guild_id, timezone)
             embed = {
                 'color': constants.BLURPLE,
                 'title': 'Setting changed!',
@@ -125,10 +143,10 @@ class SettingsCog(commands.Cog, name='Settings'):
                     f'No channel {channel.mention} found in this server.', ephemeral=True)
                 return
 
-            data.set_target(ctx.guild_id, channel.id)
+            await data.set_target(ctx.guild_id, channel.id)
             description = f'New Reminder Channel: {channel.mention}'
         else:
-            data.set_target(ctx.guild_id, None)
+            await data.set_target(ctx.guild_id, None)
             description = 'Reminder channel unset.'
 
         embed = {
@@ -157,10 +175,10 @@ class SettingsCog(commands.Cog, name='Settings'):
                 await ctx.respond(f'No role {role.mention} found in this server.', ephemeral=True)
                 return
 
-            data.set_role(ctx.guild_id, role.id)
+            await data.set_role(ctx.guild_id, role.id)
             description = f'New Manager Role: {role.mention}'
         else:
-            data.set_role(ctx.guild_id, None)
+            await data.set_role(ctx.guild_id, None)
             description = 'Manager role unset.'
 
         embed = {
@@ -169,3 +187,49 @@ class SettingsCog(commands.Cog, name='Settings'):
             'description': description
         }
         await ctx.respond(embed=discord.Embed.from_dict(embed))
+
+    @settings_group.command()
+    @discord.option('enabled', type=bool, required=True,
+                    description='Whether to combine reminders due together into fewer messages')
+    async def combine(self, ctx: discord.ApplicationContext, enabled: bool):
+        """Set whether reminders due together in a channel are combined"""
+        author = ctx.guild.get_member(ctx.author.id)
+        if not author.guild_permissions.manage_guild:
+            await ctx.respond(
+                "You must have the `Manage Guild` permission to edit settings!",
+                ephemeral=True
+            )
+            return
+
+        await data.set_coalesce(ctx.guild_id, enabled)
+        embed = {
+            'color': constants.BLURPLE,
+            'title': 'Setting changed!',
+            'description': f'Combine Reminders: `{"Enabled" if enabled else "Disabled"}`'
+        }
+        await ctx.respond(embed=discord.Embed.from_dict(embed))
+
+    @settings_group.command()
+    @discord.option('enabled', type=bool, required=True,
+                    description='Whether to send reminders through a webhook in each channel')
+    async def webhook(self, ctx: discord.ApplicationContext, enabled: bool):
+        """Set whether reminders are sent through webhooks"""
+        author = ctx.guild.get_member(ctx.author.id)
+        if not author.guild_permissions.manage_guild:
+            await ctx.respond(
+                "You must have the `Manage Guild` permission to edit settings!",
+                ephemeral=True
+            )
+            return
+
+        await data.set_webhook(ctx.guild_id, enabled)
+        description = f'Send Through Webhooks: `{"Enabled" if enabled else "Disabled"}`'
+        if enabled and not ctx.guild.me.guild_permissions.manage_webhooks:
+            description += ('\nThe bot needs the `Manage Webhooks` permission to do this, '
+                            'until then reminders are sent as normal.')
+        embed = {
+            'color': constants.BLURPLE,
+            'title': 'Setting changed!',
+            'description': description
+        }
+        await ctx.respond(embed=discord.Embed.from_dict(embed))
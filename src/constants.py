@@ -4,6 +4,7 @@ Constants used by the application
 import itertools
 import re
 import json
+from pathlib import Path
 
 # REGEX taken from
 # https://github.com/wroberts/pytimeparse/blob/master/pytimeparse/timeparse.py
@@ -34,12 +35,61 @@ INTERVAL_REGEX = re.compile(r'\s*' + INTERVAL_FORMAT + r'\s*$', re.I)
 
 TOMORROW    = r'(?:tmrw?|tmw|tomorrow)'
 TODAY       = r'(?:today|tdy)'
+
+TOMORROW_REGEX = re.compile(TOMORROW)
+TODAY_REGEX    = re.compile(TODAY)
+
+# Fast path for the most common date and time shapes, e.g.
+# 'tomorrow 8pm', 'friday 9:30am', '26/05/2003 13:37' or '5 jun 2024 at 8:00 pm'
+WEEKDAYS = {
+    'monday': 0, 'mon': 0,
+    'tuesday': 1, 'tues': 1, 'tue': 1,
+    'wednesday': 2, 'weds': 2, 'wed': 2,
+    'thursday': 3, 'thurs': 3, 'thur': 3, 'thu': 3,
+    'friday': 4, 'fri': 4,
+    'saturday': 5, 'sat': 5,
+    'sunday': 6, 'sun': 6,
+}
+MONTHS = {
+    'january': 1, 'jan': 1,
+    'february': 2, 'feb': 2,
+    'march': 3, 'mar': 3,
+    'april': 4, 'apr': 4,
+    'may': 5,
+    'june': 6, 'jun': 6,
+    'july': 7, 'jul': 7,
+    'august': 8, 'aug': 8,
+    'september': 9, 'sept': 9, 'sep': 9,
+    'october': 10, 'oct': 10,
+    'november': 11, 'nov': 11,
+    'december': 12, 'dec': 12,
+}
+
+ALTERNATIVES = lambda x: '|'.join(sorted(x, key=len, reverse=True))
+
+FAST_DAY    = (r'(?P<relative>today|tomorrow)'
+               r'|(?P<weekday>{WEEKDAYS})'
+               r'|(?P<day>\d{{1,2}})[/.-](?P<month>\d{{1,2}})(?:[/.-](?P<year>\d{{4}}))?'
+               r'|(?P<mday>\d{{1,2}})(?:st|nd|rd|th)?\s+(?P<mname>{MONTHS})\.?(?:\s+(?P<myear>\d{{4}}))?').format(
+    WEEKDAYS=ALTERNATIVES(WEEKDAYS),
+    MONTHS=ALTERNATIVES(MONTHS))
+FAST_TIME   = (r'(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<meridiem>am|pm)'
+               r'|(?P<hour24>\d{1,2}):(?P<minute24>\d{2})')
+
+FAST_DATETIME_REGEX = re.compile(
+    r'(?:{FAST_DAY})(?:,?\s+(?:at\s+)?(?:{FAST_TIME}))?$'.format(FAST_DAY=FAST_DAY, FAST_TIME=FAST_TIME))
+
+# Any explicit clock time, which makes a parse depend only on the current date
+CLOCK_REGEX = re.compile(r'\d\s*(?:am|pm)\b|\d:\d{2}')
+
 DATE_FORMAT = '%-d %b %Y at %-I:%M %p'
 
 BLURPLE = 0x5865f2
 GREEN = 0x57f287
 RED = 0xed4245
 
-with open('tzdata/tz_countries.json', 'r') as f:
+TZDATA = Path(__file__).resolve().parent.parent / 'tzdata' / 'tz_countries.json'
+
+with open(TZDATA, 'r') as f:
     TZ_COUNTRIES = json.load(f)
     TZ_ALL = list(itertools.chain(*[tz_list for tz_list in TZ_COUNTRIES.values()]))
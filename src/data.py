@@ -1,153 +1,572 @@
 """
 Class to store data using an interface to the MongoDB Client
 Prompts and lists will not persist, fuck em
+
+pymongo is blocking, so every query is run on a small thread pool and
+awaited, keeping the event loop free for the gateway and other interactions.
 """
+import asyncio
+import logging
 import os
+import secrets
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from functools import partial
+from typing import Callable
 
 import dotenv
-from pymongo import MongoClient
+from bson import ObjectId
+from pymongo import ASCENDING, DeleteMany, IndexModel, MongoClient, ReplaceOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
 from pymongo.server_api import ServerApi
 
-from src.models.reminder import Reminder
+from src.metrics import metrics
+from src.models.reminder import Reminder, shard_key
+from src.models.settings import GuildSettings
+
+# Maximum number of due reminders fetched per round trip
+BATCH_SIZE = 500
+
+# Seconds a claimed reminder is reserved for, before other workers may take it
+# over. Long enough for a full batch to drain into a single rate limited channel
+LEASE = 15 * 60
+
+# Reminder IDs are short enough to type, without easily confused characters
+ID_ALPHABET = '23456789abcdefghjkmnpqrstuvwxyz'
+ID_LENGTH = 6
+
+# Indexes backing every query below, bump INDEX_VERSION whenever they change
+INDEX_VERSION = 3
+INDEXES = {
+    'reminders': [
+        # current_reminders, upcoming_times and count_overdue
+        IndexModel([('time', ASCENDING), ('_id', ASCENDING)], name='time_id'),
+        # reminder_page, count_reminders, next_recurring and remove_guild
+        IndexModel([('guild_id', ASCENDING), ('time', ASCENDING), ('_id', ASCENDING)],
+                   name='guild_time_id'),
+        IndexModel([('guild_id', ASCENDING), ('author_id', ASCENDING), ('time', ASCENDING),
+                    ('_id', ASCENDING)], name='guild_author_time_id'),
+    ],
+    'dead_reminders': [
+        # dead_letters and replay_dead_letters
+        IndexModel([('guild_id', ASCENDING), ('failed_at', ASCENDING)], name='guild_failed_at'),
+        IndexModel([('reason', ASCENDING), ('failed_at', ASCENDING)], name='reason_failed_at'),
+    ]
+}
+
+# Fields needed to load a reminder, leaving out leases and shard keys
+REMINDER_PROJECTION = {
+    'text': 1,
+    'author_id': 1,
+    'guild_id': 1,
+    'channel_id': 1,
+    'time': 1,
+    'interval': 1,
+    'timezone': 1,
+    'attempts': 1
+}
 
+log = logging.getLogger(__name__)
 
-class MyMongoClient(MongoClient):
-    """Custom interface for MongoDB database"""
+# Records the latency of each database method by name
+timed = metrics.mongo_seconds.timed('method')
+
+
+class MyMongoClient:
+    """
+    Custom interface for MongoDB database
+
+    The MongoClient is only created on first use, as creating it may block
+    on resolving the DNS records of the connection string.
+    """
 
     def __init__(self):
         dotenv.load_dotenv()
-        super().__init__(
-            os.getenv('MONGODB_URL'), server_api=ServerApi('1'), connect=False)
-        self.db = self.reminderbot
+        self._client: MongoClient | None = None
+        self._client_lock = threading.Lock()
+
+        # Bounded so a burst of queries can't exhaust the connection pool
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('MONGODB_WORKERS', '8')),
+            thread_name_prefix='mongo'
+        )
+
+        # Identifies this process when claiming reminders
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}'
 
-    def ping(self):
+        # Restricts reminder queries to the shards run by this process
+        self.shard_query = {}
+
+        # Settings of every guild seen so far, kept in sync on write
+        self.settings_cache: dict[int, GuildSettings] = {}
+
+        # Called with every newly added reminder, and every reminder moved to a new time
+        self.insert_listeners: list[Callable[[Reminder], None]] = []
+
+    @property
+    def db(self):
+        """The bot's database, creating the client if needed"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = MongoClient(
+                        os.getenv('MONGODB_URL'), server_api=ServerApi('1'), connect=False)
+        return self._client[os.getenv('MONGODB_DB', 'reminderbot')]
+
+    @timed
+    async def connect(self):
+        """Create the client and ping the database, off the event loop"""
+        await self._run(lambda: self.db.command('ping'))
+        log.info('Connected to MongoDB')
+
+    async def _run(self, func, *args, **kwargs):
+        """Run a blocking pymongo call on the executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, partial(func, *args, **kwargs))
+
+    @timed
+    async def ping(self):
         """Ping the database"""
-        self.db.command('ping')
+        await self._run(self.db.command, 'ping')
+
+    def set_shards(self, shard_count: int, shard_ids: list[int]):
+        """Only schedule reminders for guilds on the given shards"""
+        if set(shard_ids) == set(range(shard_count)):
+            self.shard_query = {}
+        else:
+            self.shard_query = {
+                '$or': [{'shard_key': {'$mod': [shard_count, i]}} for i in shard_ids]
+            }
+
+    @timed
+    async def backfill_shard_keys(self):
+        """Set shard_key on reminders created before sharding was supported"""
+        res = await self._run(lambda: list(self.db.reminders.find(
+            {'shard_key': {'$exists': False}}, {'guild_id': 1})))
+        if res:
+            await self._run(self.db.reminders.bulk_write, [
+                UpdateOne({'_id': rem['_id']}, {'$set': {'shard_key': shard_key(rem['guild_id'])}})
+                for rem in res
+            ], ordered=False)
+            log.info('Backfilled shard keys on %d reminders', len(res))
+
+    @timed
+    async def ensure_indexes(self):
+        """Create any missing indexes and drop stale ones if INDEXES has changed"""
+        meta = await self._run(self.db.meta.find_one, {'_id': 'indexes'})
+        if meta and meta['version'] >= INDEX_VERSION:
+            return
+
+        for name, models in INDEXES.items():
+            collection = self.db[name]
+            await self._run(collection.create_indexes, models)
 
-    def add_reminder(self, reminder: Reminder):
-        """Add a reminder to the database"""
-        self.db.reminders.insert_one(reminder.__dict__)
+            wanted = {model.document['name'] for model in models} | {'_id_'}
+            existing = await self._run(collection.index_information)
+            for index in existing.keys() - wanted:
+                await self._run(collection.drop_index, index)
 
-    def remove_reminder(self, reminder: Reminder):
+        await self._run(
+            self.db.meta.update_one,
+            {'_id': 'indexes'}, {'$set': {'version': INDEX_VERSION}}, upsert=True)
+        log.info('Provisioned indexes at version %d', INDEX_VERSION)
+
+    @timed
+    async def add_reminder(self, reminder: Reminder):
+        """Add a reminder to the database, giving it a new ID"""
+        while True:
+            reminder.id = new_id()
+            try:
+                await self._run(self.db.reminders.insert_one, reminder.to_dict())
+                break
+            except DuplicateKeyError:
+                # ID collision, try another
+                pass
+
+        for listener in self.insert_listeners:
+            listener(reminder)
+
+    @timed
+    async def remove_reminder(self, reminder: Reminder):
         """Delete a reminder from the database"""
-        self.db.reminders.delete_one(reminder.__dict__)
+        await self._run(self.db.reminders.delete_one, {'_id': reminder.id})
+
+    @timed
+    async def get_reminder(self, guild_id: int, reminder_id: str):
+        """Retrieve a reminder in the given guild by ID"""
+        res = await self._run(
+            self.db.reminders.find_one,
+            {'_id': parse_id(reminder_id), 'guild_id': guild_id}, REMINDER_PROJECTION)
+        return Reminder.from_dict(res) if res else None
+
+    @timed
+    async def remove_reminder_by_id(self, guild_id: int, reminder_id: str, author_id: int | None = None):
+        """
+        Delete a reminder in the given guild by ID, returning it if it was deleted
+
+        If author_id is given, the reminder is only deleted if it is theirs
+        """
+        query = {'_id': parse_id(reminder_id), 'guild_id': guild_id}
+        if author_id is not None:
+            query['author_id'] = author_id
+
+        res = await self._run(self.db.reminders.find_one_and_delete, query)
+        return Reminder.from_dict(res) if res else None
+
+    async def get_settings(self, guild_id: int) -> GuildSettings:
+        """Retrieve the settings of the given guild, creating them if missing"""
+        settings = self.settings_cache.get(guild_id)
+        if settings is None:
+            settings = self.settings_cache[guild_id] = await self._load_settings(guild_id)
+        return settings
 
-    def get_timezone(self, guild_id: int):
+    @timed
+    async def _load_settings(self, guild_id: int) -> GuildSettings:
+        """Read the settings of the given guild from the database, creating them if missing"""
+        guild = await self._run(self.db.guilds.find_one, {'_id': guild_id})
+        if guild:
+            settings = GuildSettings.from_dict(guild)
+        else:
+            settings = GuildSettings(guild_id)
+            await self._run(
+                self.db.guilds.update_one,
+                {'_id': guild_id}, {'$setOnInsert': settings.to_dict()}, upsert=True)
+        return settings
+
+    @timed
+    async def _update_settings(self, guild_id: int, **fields):
+        """Write the given settings fields through to the database and cache"""
+        defaults = GuildSettings(guild_id).to_dict()
+        on_insert = {k: v for k, v in defaults.items() if k not in fields}
+        await self._run(
+            self.db.guilds.update_one,
+            {'_id': guild_id}, {'$set': fields, '$setOnInsert': on_insert}, upsert=True)
+
+        settings = self.settings_cache.get(guild_id)
+        if settings is not None:
+            for field, value in fields.items():
+                setattr(settings, field, value)
+
+    @timed
+    async def warm_settings(self, guild_ids: list[int]):
+        """Load the settings of the given guilds into the cache"""
+        res = await self._run(
+            lambda: list(self.db.guilds.find({'_id': {'$in': guild_ids}})))
+        for guild in res:
+            settings = GuildSettings.from_dict(guild)
+            self.settings_cache[settings.guild_id] = settings
+
+    async def get_timezone(self, guild_id: int):
         """Retrieve the timezone of the given guild"""
-        guild = self.db.guilds.find_one(
-            {'_id': guild_id}, {'timezone': 1, '_id': 0})
-        if not guild:
-            self.db.guilds.insert_one({
-                '_id': guild_id,
-                'timezone': 'UTC',
-                'target': None,
-                'role': None
-            })
-            return 'UTC'
-
-        return guild['timezone']
-
-    def set_timezone(self, guild_id: int, tz: str):
-        """Update the timezone of the given guild"""
-        guild = self.db.guilds.find_one_and_update(
-            {'_id': guild_id}, {'$set': {'timezone': tz}})
-        if not guild:
-            self.db.guilds.insert_one({
-                '_id': guild_id,
-                'timezone': tz,
-                'target': None,
-                'role': None
-            })
-
-    def get_target(self, guild_id: int):
+        return (await self.get_settings(guild_id)).timezone
+
+    async def set_timezone(self, guild_id: int, tz: str):
+        """Update the timezone of the given guild and its reminders"""
+        await self._update_settings(guild_id, timezone=tz)
+        await self._run(
+            self.db.reminders.update_many, {'guild_id': guild_id}, {'$set': {'timezone': tz}})
+
+    async def get_target(self, guild_id: int):
         """Retrieve the target channel of the given guild"""
-        guild = self.db.guilds.find_one(
-            {'_id': guild_id}, {'target': 1, '_id': 0})
-        if not guild:
-            self.db.guilds.insert_one({
-                '_id': guild_id,
-                'timezone': 'UTC',
-                'target': None,
-                'role': None
-            })
-            return None
-
-        return guild['target']
-
-    def set_target(self, guild_id: int, target: int):
+        return (await self.get_settings(guild_id)).target
+
+    async def set_target(self, guild_id: int, target: int):
         """Update the target channel of the given guild"""
-        guild = self.db.guilds.find_one_and_update(
-            {'_id': guild_id}, {'$set': {'target': target}})
-        if not guild:
-            self.db.guilds.insert_one({
-                '_id': guild_id,
-                'timezone': 'UTC',
-                'target': target,
-                'role': None
-            })
-
-    def get_role(self, guild_id: int):
+        await self._update_settings(guild_id, target=target)
+
+    async def get_role(self, guild_id: int):
         """Retrieve the manager role of the given guild"""
-        guild = self.db.guilds.find_one(
-            {'_id': guild_id}, {'role': 1, '_id': 0})
-        if not guild:
-            self.db.guilds.insert_one({
-                '_id': guild_id,
-                'timezone': 'UTC',
-                'target': None,
-                'role': None
-            })
-            return None
-
-        return guild['role']
-
-    def set_role(self, guild_id: int, role: int):
+        return (await self.get_settings(guild_id)).role
+
+    async def set_role(self, guild_id: int, role: int):
         """Update the manager role of the given guild"""
-        guild = self.db.guilds.find_one_and_update(
-            {'_id': guild_id}, {'$set': {'role': role}})
-        if not guild:
-            self.db.guilds.insert_one({
-                '_id': guild_id,
-                'timezone': 'UTC',
-                'target': None,
-                'role': role
-            })
-
-    def guild_reminders(self, guild_id: int):
-        """Returns a list of all reminders matching the given guild_id"""
-        res = self.db.reminders.find(
-            {'guild_id': guild_id}, sort=[('time', 1)])
-        return [Reminder.from_dict(rem) for rem in res]
-
-    def current_reminders(self):
-        """Generator that deletes returns all Reminders this minute"""
-        now = datetime.now(timezone.utc).timestamp() // 60 * 60
-        # Take advantage of the fact that there should be no reminders lt now
-        cursor = self.db.reminders.find({'time': {'$lt': int(now) + 60}})
-
-        try:
-            curr = next(cursor)
-        except StopIteration:
-            return
+        await self._update_settings(guild_id, role=role)
 
+    async def set_coalesce(self, guild_id: int, coalesce: bool):
+        """Update whether the given guild combines reminders into fewer messages"""
+        await self._update_settings(guild_id, coalesce=coalesce)
+
+    async def set_webhook(self, guild_id: int, webhook: bool):
+        """Update whether the given guild sends reminders through webhooks"""
+        await self._update_settings(guild_id, webhook=webhook)
+
+    @timed
+    async def reminder_page(
+        self,
+        guild_id: int,
+        limit: int,
+        author_id: int | None = None,
+        after: Reminder | None = None,
+        before: Reminder | None = None,
+        last: bool = False
+    ):
+        """
+        Returns a page of the given guild's reminders ordered by time
+
+        Pages start from the first reminder, or just after `after`, or end just
+        before `before`, or at the last reminder if `last` is set. Reminders may
+        be filtered to those by the given author.
+        """
+        query = {'guild_id': guild_id}
+        if author_id is not None:
+            query['author_id'] = author_id
+
+        backwards = before is not None or last
+        if after is not None:
+            query['$or'] = [
+                {'time': {'$gt': after.time}},
+                {'time': after.time, '_id': {'$gt': after.id}}
+            ]
+        elif before is not None:
+            query['$or'] = [
+                {'time': {'$lt': before.time}},
+                {'time': before.time, '_id': {'$lt': before.id}}
+            ]
+
+        direction = -1 if backwards else 1
+        sort = [('time', direction), ('_id', direction)]
+        reminders = await self._run(
+            lambda: Reminder.from_dicts(self.db.reminders.find(
+                query, REMINDER_PROJECTION, sort=sort, limit=limit)))
+        if backwards:
+            reminders.reverse()
+        return reminders
+
+    @timed
+    async def count_reminders(self, guild_id: int, author_id: int | None = None):
+        """Returns the number of reminders in the given guild, optionally by an author"""
+        query = {'guild_id': guild_id}
+        if author_id is not None:
+            query['author_id'] = author_id
+        return await self._run(self.db.reminders.count_documents, query)
+
+    @timed
+    async def next_recurring(self, guild_id: int, limit: int):
+        """Returns up to `limit` of the given guild's recurring reminders, soonest first"""
+        return await self._run(lambda: Reminder.from_dicts(self.db.reminders.find(
+            {'guild_id': guild_id, 'interval': {'$nin': [None, '']}},
+            REMINDER_PROJECTION, sort=[('time', 1), ('_id', 1)], limit=limit)))
+
+    @timed
+    async def upcoming_times(self, until: int):
+        """
+        Returns the times at which reminders due before the given timestamp
+        can next be claimed
+
+        That is after their lease, for reminders waiting to be retried or
+        claimed by another worker. Those only claimable after `until` are
+        left for a later call.
+        """
+        res = await self._run(
+            lambda: list(self.db.reminders.find(
+                {'time': {'$lt': until}, **self.shard_query}, {'time': 1, 'lease_until': 1, '_id': 0})))
+        claimable = (max(rem['time'], rem.get('lease_until') or 0) for rem in res)
+        return [at for at in claimable if at < until]
+
+    async def current_reminders(self, batch_size: int = BATCH_SIZE, newest_first: bool = False):
+        """
+        Async generator that claims and yields all Reminders that are due in batches,
+        the most overdue first unless newest_first is set
+
+        Every yielded reminder must be passed to complete_reminders or
+        dead_letter. Reminders that are neither, e.g. because this worker
+        crashed, are picked up by any worker once their lease expires.
+        """
+        now = int(datetime.now(timezone.utc).timestamp())
         while True:
-            print("Retrieved reminder:", curr)
-            yield Reminder.from_dict(curr)
-            self.db.reminders.delete_one({'_id': curr['_id']})
-            try:
-                curr = next(cursor)
-            except StopIteration:
-                break
-    
-    def all_guilds(self):
+            batch = await self.claim_reminders(now, batch_size, newest_first)
+            if not batch:
+                return
+            yield batch
+
+    @timed
+    async def claim_reminders(self, due: int, limit: int, newest_first: bool = False):
+        """
+        Lease up to `limit` unclaimed reminders due by the given time to this worker
+
+        Other workers may be claiming the same reminders at once, so only the
+        reminders whose lease was actually taken by this worker are returned.
+        """
+        now = int(datetime.now(timezone.utc).timestamp())
+        unclaimed = {'time': {'$lte': due}, 'lease_until': {'$not': {'$gt': now}}, **self.shard_query}
+        direction = -1 if newest_first else 1
+        sort = [('time', direction), ('_id', direction)]
+
+        candidates = await self._run(lambda: list(self.db.reminders.find(
+            unclaimed, {'_id': 1}, sort=sort, limit=limit)))
+        if not candidates:
+            return []
+        ids = [rem['_id'] for rem in candidates]
+
+        await self._run(
+            self.db.reminders.update_many,
+            {'_id': {'$in': ids}, **unclaimed},
+            {'$set': {'lease_until': now + LEASE, 'lease_owner': self.worker_id}})
+
+        return await self._run(lambda: Reminder.from_dicts(self.db.reminders.find(
+            {'_id': {'$in': ids}, 'lease_owner': self.worker_id},
+            REMINDER_PROJECTION, sort=sort)))
+
+    @timed
+    async def count_overdue(self, before: int):
+        """Returns the number of unclaimed reminders that were due before the given timestamp"""
+        now = int(datetime.now(timezone.utc).timestamp())
+        return await self._run(self.db.reminders.count_documents, {
+            'time': {'$lt': before}, 'lease_until': {'$not': {'$gt': now}}, **self.shard_query})
+
+    @timed
+    async def complete_reminders(
+        self,
+        reminders: list[Reminder],
+        rescheduled: list[Reminder] = (),
+        retries: list[tuple[Reminder, str, int]] = ()
+    ):
+        """
+        Finish a batch of claimed reminders in a single write
+
+        Executed reminders are deleted, except for rescheduled recurring
+        reminders, which keep their document and move to their new time.
+        Retries are (reminder, reason, delay) for failed attempts, which are
+        released to be claimed again once the delay has passed.
+        """
+        requests = []
+        if reminders:
+            requests.append(DeleteMany(
+                {'_id': {'$in': [r.id for r in reminders]}, 'lease_owner': self.worker_id}))
+        for reminder in rescheduled:
+            requests.append(UpdateOne(
+                {'_id': reminder.id, 'lease_owner': self.worker_id},
+                {'$set': {'time': reminder.time, 'timezone': reminder.timezone, 'attempts': 0},
+                 '$unset': {'lease_until': '', 'lease_owner': '', 'last_error': ''}}))
+
+        now = int(datetime.now(timezone.utc).timestamp())
+        for reminder, reason, delay in retries:
+            # The lease doubles as the time before which it may not be retried
+            requests.append(UpdateOne(
+                {'_id': reminder.id, 'lease_owner': self.worker_id},
+                {'$set': {'lease_until': now + delay, 'attempts': reminder.attempts, 'last_error': reason},
+                 '$unset': {'lease_owner': ''}}))
+        if not requests:
+            return
+
+        await self._run(self.db.reminders.bulk_write, requests, ordered=False)
+        for reminder in rescheduled:
+            for listener in self.insert_listeners:
+                listener(reminder)
+
+    @timed
+    async def release_reminders(self, reminders: list[Reminder]):
+        """Give up claimed reminders that weren't handled, letting any worker claim them at once"""
+        if not reminders:
+            return
+
+        await self._run(
+            self.db.reminders.update_many,
+            {'_id': {'$in': [r.id for r in reminders]}, 'lease_owner': self.worker_id},
+            {'$unset': {'lease_until': '', 'lease_owner': ''}})
+        for reminder in reminders:
+            for listener in self.insert_listeners:
+                listener(reminder)
+
+    @timed
+    async def dead_letter(self, failures: list[tuple[Reminder, str]]):
+        """Move claimed reminders that failed permanently to the dead-letter collection"""
+        if not failures:
+            return
+
+        now = int(datetime.now(timezone.utc).timestamp())
+        await self._run(self.db.dead_reminders.bulk_write, [
+            ReplaceOne({'_id': reminder.id}, {**reminder.to_dict(), 'reason': reason, 'failed_at': now},
+                       upsert=True)
+            for reminder, reason in failures
+        ], ordered=False)
+        await self._run(
+            self.db.reminders.delete_many,
+            {'_id': {'$in': [r.id for r, _ in failures]}, 'lease_owner': self.worker_id})
+
+    @staticmethod
+    def _dead_letter_query(guild_id: int | None = None, reason: str | None = None, ids: list[str] | None = None):
+        query = {}
+        if guild_id is not None:
+            query['guild_id'] = guild_id
+        if reason is not None:
+            query['reason'] = reason
+        if ids:
+            query['_id'] = {'$in': [parse_id(i) for i in ids]}
+        return query
+
+    @timed
+    async def dead_letters(self, guild_id: int | None = None, reason: str | None = None, limit: int = 0):
+        """Returns dead-lettered reminder documents, oldest failure first, optionally filtered"""
+        query = self._dead_letter_query(guild_id, reason)
+        return await self._run(lambda: list(self.db.dead_reminders.find(
+            query, sort=[('failed_at', 1)], limit=limit)))
+
+    @timed
+    async def count_dead_letters(self, guild_id: int | None = None, reason: str | None = None):
+        """Returns the number of dead-lettered reminders, optionally filtered"""
+        query = self._dead_letter_query(guild_id, reason)
+        return await self._run(self.db.dead_reminders.count_documents, query)
+
+    @timed
+    async def replay_dead_letters(
+        self,
+        guild_id: int | None = None,
+        reason: str | None = None,
+        ids: list[str] | None = None
+    ):
+        """
+        Move matching dead-lettered reminders back to be delivered, returning
+        how many were replayed
+
+        Their attempts are reset, and any that were due in the past are due now.
+        """
+        query = self._dead_letter_query(guild_id, reason, ids)
+        docs = await self._run(lambda: list(self.db.dead_reminders.find(query)))
+        if not docs:
+            return 0
+
+        now = int(datetime.now(timezone.utc).timestamp())
+        reminders = Reminder.from_dicts(docs)
+        for reminder in reminders:
+            reminder.time = max(reminder.time, now)
+            reminder.attempts = 0
+        await self._run(self.db.reminders.bulk_write, [
+            ReplaceOne({'_id': reminder.id}, reminder.to_dict(), upsert=True) for reminder in reminders
+        ], ordered=False)
+        await self._run(
+            self.db.dead_reminders.delete_many, {'_id': {'$in': [r.id for r in reminders]}})
+
+        for reminder in reminders:
+            for listener in self.insert_listeners:
+                listener(reminder)
+        return len(reminders)
+
+    @timed
+    async def all_guilds(self):
         """Return all guilds"""
-        return self.db.guilds.find({})
-    
-    def remove_guild(self, guild_id: int):
+        return await self._run(lambda: list(self.db.guilds.find({})))
+
+    @timed
+    async def remove_guild(self, guild_id: int):
         """Remove guild by ID and all related reminders"""
-        self.db.guilds.delete_one({'_id': guild_id})
-        self.db.reminders.delete_many({'guild_id': guild_id})
+        self.settings_cache.pop(guild_id, None)
+        await self._run(self.db.guilds.delete_one, {'_id': guild_id})
+        await self._run(self.db.reminders.delete_many, {'guild_id': guild_id})
+
+
+def new_id():
+    """Generate a random reminder ID"""
+    return ''.join(secrets.choice(ID_ALPHABET) for _ in range(ID_LENGTH))
+
+
+def parse_id(reminder_id: str):
+    """Convert a user entered ID to an _id, including those of older reminders"""
+    reminder_id = reminder_id.strip().lower()
+    return ObjectId(reminder_id) if ObjectId.is_valid(reminder_id) else reminder_id
 
 
 data = MyMongoClient()
@@ -0,0 +1,59 @@
+"""
+Command line tool to inspect and replay dead-lettered reminders
+
+Reminders that failed to deliver MAX_ATTEMPTS times are moved to the
+dead_reminders collection with the reason for their last failure. Replayed
+reminders are due immediately, and are picked up by a running bot within
+one scheduler horizon.
+
+Usage:
+    python -m src.deadletter list [--guild ID] [--reason REASON] [--limit N]
+    python -m src.deadletter replay [--guild ID] [--reason REASON] [--all] [ID ...]
+"""
+import argparse
+import asyncio
+from datetime import datetime, timezone
+
+from src.data import data
+
+parser = argparse.ArgumentParser(prog='python -m src.deadletter', description=__doc__.split('\n\n')[0])
+commands = parser.add_subparsers(dest='command', required=True)
+
+list_parser = commands.add_parser('list', help='show dead-lettered reminders, oldest failure first')
+list_parser.add_argument('--guild', type=int, help='only reminders in this guild')
+list_parser.add_argument('--reason', help='only reminders that failed for this reason, e.g. channel_not_found')
+list_parser.add_argument('--limit', type=int, default=50, help='maximum number to show, 0 for all')
+
+replay_parser = commands.add_parser('replay', help='move dead-lettered reminders back to be delivered')
+replay_parser.add_argument('ids', nargs='*', help='IDs of the reminders to replay')
+replay_parser.add_argument('--guild', type=int, help='only reminders in this guild')
+replay_parser.add_argument('--reason', help='only reminders that failed for this reason')
+replay_parser.add_argument('--all', action='store_true', help='replay every dead-lettered reminder')
+
+
+async def list_dead_letters(args):
+    total = await data.count_dead_letters(args.guild, args.reason)
+    docs = await data.dead_letters(args.guild, args.reason, args.limit)
+    for doc in docs:
+        failed_at = datetime.fromtimestamp(doc['failed_at'], tz=timezone.utc).strftime('%Y-%m-%d %H:%M')
+        print(f"{doc['_id']}  {failed_at}  {doc['reason']:<18} attempts={doc.get('attempts', 0)}  "
+              f"guild={doc['guild_id']} channel={doc['channel_id']} author={doc['author_id']}")
+    print(f'Showing {len(docs)} of {total} dead-lettered reminders')
+
+
+async def replay_dead_letters(args):
+    if not (args.ids or args.guild or args.reason or args.all):
+        parser.error('give reminder IDs, --guild or --reason to choose what to replay, or --all')
+
+    count = await data.replay_dead_letters(args.guild, args.reason, args.ids or None)
+    print(f'Replayed {count} reminders')
+
+
+def main():
+    args = parser.parse_args()
+    handler = {'list': list_dead_letters, 'replay': replay_dead_letters}[args.command]
+    asyncio.run(handler(args))
+
+
+if __name__ == '__main__':
+    main()
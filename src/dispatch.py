@@ -0,0 +1,552 @@
+"""
+Concurrent dispatcher for due reminders
+
+Reminders are grouped by the channel they will be sent to. Each channel is
+worked through in order, while different channels are sent to concurrently
+by a bounded pool of workers.
+
+After downtime, the backlog of overdue reminders is drained in batches
+ordered by the catch-up policy, and recurring reminders are delivered once
+with their repeat moved to the first occurrence still in the future.
+
+Guilds may opt in to coalescing, where the reminders sent to one channel
+in the same batch are combined into as few messages as possible. Only
+reminders whose authors may make the same mentions share a message.
+
+Guilds may also opt in to sending through a webhook in each channel, which
+has its own rate limit. Channels where the bot can't manage webhooks are
+sent to as normal.
+
+A reminder that fails to deliver is retried on its own with exponential
+backoff, without holding up the rest of its batch. After MAX_ATTEMPTS it
+is moved to the dead-letter collection, see src.deadletter. A reminder
+that Discord rejects outright, e.g. as too long, is dead-lettered at once.
+"""
+import asyncio
+import logging
+import os
+import time
+
+import discord
+
+from src.data import data
+from src.log import events
+from src.metrics import metrics
+from src.models.reminder import Reminder
+from src.resolver import MemberResolver
+from src.webhooks import WebhookCache
+
+# Maximum number of reminders being sent at once
+WORKERS = 25
+
+# Seconds a single reminder may take before it is abandoned until the next retry
+TIMEOUT = 10
+
+# Seconds to spend resolving a batch's authors up front, before sending anyway.
+# Authors still unresolved are looked up as their reminder is delivered
+RESOLVE_TIMEOUT = 5
+
+# Failed reminders are retried after RETRY_DELAY seconds, doubling each attempt
+# up to MAX_RETRY_DELAY, and dead-lettered after MAX_ATTEMPTS
+RETRY_DELAY = 60
+MAX_RETRY_DELAY = 60 * 60
+MAX_ATTEMPTS = 8
+
+# Reminders more overdue than this many seconds mean the bot is catching up on a backlog
+CATCH_UP_AFTER = 5 * 60
+
+# Which of the backlog to send first, 'oldest' (most overdue) or 'newest'
+CATCH_UP_POLICY = os.getenv('CATCH_UP_POLICY', 'oldest')
+CATCH_UP_POLICIES = ('oldest', 'newest')
+
+# Maximum length of a Discord message
+MESSAGE_LIMIT = 2000
+
+# Discord allows 50 requests per second globally, and 5 messages per 5 seconds per channel
+GLOBAL_RATE = (50, 1)
+CHANNEL_RATE = (5, 5)
+
+# Each webhook allows 5 messages per 2 seconds, separately from the bot's own buckets
+WEBHOOK_RATE = (5, 2)
+
+log = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` requests every `per` seconds
+
+    Attributes
+    rate: int
+        Number of requests allowed per period
+    per: float
+        Length of the period in seconds
+    """
+
+    def __init__(self, rate: int, per: float):
+        self.rate = rate
+        self.per = per
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """Wait for a request to be allowed, returning the seconds waited"""
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.rate, self._tokens + (now - self._updated) * self.rate / self.per)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+
+                delay = (1 - self._tokens) * self.per / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def idle(self) -> bool:
+        """Whether the bucket has fully refilled"""
+        elapsed = time.monotonic() - self._updated
+        return self._tokens + elapsed * self.rate / self.per >= self.rate
+
+
+class DeliveryFailed(Exception):
+    """
+    Raised when a reminder can't be delivered this attempt, but may be later
+
+    Attributes
+    reason: str
+        Short machine readable reason for the failure
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def backoff(attempts: int) -> int:
+    """Seconds to wait before retrying a reminder that has failed the given number of times"""
+    return min(MAX_RETRY_DELAY, RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def pack(segments: list[str], limit: int = MESSAGE_LIMIT) -> list[list[int]]:
+    """
+    Split segments, in order, into runs that each fit in one message when
+    joined by newlines, returning the indexes of the segments in each run
+
+    A segment longer than the limit is given a run of its own.
+    """
+    runs = []
+    run = []
+    length = 0
+    for i, segment in enumerate(segments):
+        if run and length + 1 + len(segment) > limit:
+            runs.append(run)
+            run = []
+        length = length + 1 + len(segment) if run else len(segment)
+        run.append(i)
+    if run:
+        runs.append(run)
+    return runs
+
+
+class DispatchResult:
+    """
+    Outcome of dispatching a batch of reminders
+
+    Attributes
+    completed: list[Reminder]
+        Reminders that were handled and can be removed
+    rescheduled: list[Reminder]
+        Recurring reminders that were handled and moved to their next time
+    failed: list[tuple[Reminder, str]]
+        Reminders that failed to deliver, with the reason
+    rejected: list[tuple[Reminder, str]]
+        Reminders that Discord rejected, which retrying won't fix, with the reason
+    retry_times: set[int]
+        Timestamps at which failed reminders will be retried
+    dead: list[Reminder]
+        Reminders that were rejected or failed too many times, and were dead-lettered
+    elapsed: float
+        Seconds taken to dispatch the batch
+    """
+
+    def __init__(self):
+        self.completed: list[Reminder] = []
+        self.rescheduled: list[Reminder] = []
+        self.failed: list[tuple[Reminder, str]] = []
+        self.rejected: list[tuple[Reminder, str]] = []
+        self.retry_times: set[int] = set()
+        self.dead: list[Reminder] = []
+        self.elapsed = 0.0
+
+
+class ReminderDispatcher:
+    """
+    Sends batches of due reminders concurrently across channels
+
+    Attributes
+    policy: str
+        Catch-up policy, the part of a backlog to send first
+    """
+
+    def __init__(
+        self,
+        bot: discord.Bot,
+        workers: int = WORKERS,
+        timeout: float = TIMEOUT,
+        policy: str = CATCH_UP_POLICY
+    ):
+        if policy not in CATCH_UP_POLICIES:
+            raise ValueError(f"Catch-up policy must be one of {', '.join(CATCH_UP_POLICIES)}")
+
+        self.bot = bot
+        self.timeout = timeout
+        self.policy = policy
+        self.workers = asyncio.Semaphore(workers)
+        self.global_limit = RateLimiter(*GLOBAL_RATE)
+        self.channel_limits: dict[int, RateLimiter] = {}
+        self.webhook_limits: dict[int, RateLimiter] = {}
+        self.resolver = MemberResolver()
+        self.webhooks = WebhookCache()
+
+    async def dispatch_due(self) -> DispatchResult:
+        """Claim and dispatch every due reminder, returning the combined result"""
+        start = time.perf_counter()
+        total = DispatchResult()
+
+        overdue = await data.count_overdue(int(time.time()) - CATCH_UP_AFTER)
+        metrics.overdue_reminders.set(overdue)
+        if overdue:
+            log.warning('Catching up on %d overdue reminders, %s first', overdue, self.policy)
+
+        newest_first = bool(overdue) and self.policy == 'newest'
+        async for batch in data.current_reminders(newest_first=newest_first):
+            metrics.reminders_due.inc(len(batch))
+            result = DispatchResult()
+            try:
+                await self.dispatch(batch, result)
+            finally:
+                # Also runs if stopped mid-batch, e.g. on shutdown
+                await self.finish(batch, result, total)
+
+        total.elapsed = time.perf_counter() - start
+        return total
+
+    async def finish(self, batch: list[Reminder], result: DispatchResult, total: DispatchResult):
+        """
+        Acknowledge a dispatched batch, scheduling retries and dead-lettering
+        failures, and release any reminders in it that weren't handled
+        """
+        retries = []
+        dead = []
+        now = int(time.time())
+        for reminder, reason in result.failed:
+            reminder.attempts += 1
+            if reminder.attempts >= MAX_ATTEMPTS:
+                dead.append((reminder, reason))
+            else:
+                delay = backoff(reminder.attempts)
+                retries.append((reminder, reason, delay))
+                total.retry_times.add(now + delay)
+        for reminder, reason in result.rejected:
+            reminder.attempts += 1
+            dead.append((reminder, reason))
+
+        await data.complete_reminders(result.completed, result.rescheduled, retries)
+        if dead:
+            log.warning('Dead-lettering %d reminders, %d rejected by Discord',
+                        len(dead), len(result.rejected))
+            metrics.reminders_dead.inc(len(dead))
+            await data.dead_letter(dead)
+
+        total.completed.extend(result.completed)
+        total.rescheduled.extend(result.rescheduled)
+        total.failed.extend(result.failed)
+        total.rejected.extend(result.rejected)
+        total.dead.extend(reminder for reminder, _ in dead)
+
+        handled = {id(reminder) for reminder in result.completed + result.rescheduled}
+        handled.update(id(reminder) for reminder, _ in result.failed + result.rejected)
+        unhandled = [reminder for reminder in batch if id(reminder) not in handled]
+        if unhandled:
+            log.warning('Releasing %d reminders that were claimed but not handled', len(unhandled))
+            await data.release_reminders(unhandled)
+
+    async def dispatch(
+        self,
+        reminders: list[Reminder],
+        result: DispatchResult | None = None
+    ) -> DispatchResult:
+        """
+        Send a batch of reminders, preserving order within each channel
+
+        Outcomes are recorded in result as they happen, so they are kept if
+        the dispatch is cancelled part way.
+        """
+        start = time.perf_counter()
+        result = result if result is not None else DispatchResult()
+
+        # Group by target channel, preserving order
+        channels: dict[int, list[Reminder]] = {}
+        for reminder in reminders:
+            channel_id = await data.get_target(reminder.guild_id) or reminder.channel_id
+            channels.setdefault(channel_id, []).append(reminder)
+
+        # Resolve all authors up front, in bulk per guild. Any that fail or
+        # aren't resolved in time are retried individually when their
+        # reminder is delivered
+        authors: dict[int, set[int]] = {}
+        for reminder in reminders:
+            authors.setdefault(reminder.guild_id, set()).add(reminder.author_id)
+        try:
+            await asyncio.wait_for(asyncio.gather(*(
+                self.resolver.resolve(guild, user_ids)
+                for guild_id, user_ids in authors.items()
+                if (guild := self.bot.get_guild(guild_id))
+            ), return_exceptions=True), RESOLVE_TIMEOUT)
+        except asyncio.TimeoutError:
+            log.warning('Resolving authors of %d guilds took over %gs', len(authors), RESOLVE_TIMEOUT)
+
+        # A channel only ever receives one guild's reminders
+        settings = {guild_id: await data.get_settings(guild_id) for guild_id in authors}
+        await asyncio.gather(*(
+            self.guard_channel(
+                channel_id, channel_reminders, result,
+                coalesce=settings[channel_reminders[0].guild_id].coalesce,
+                webhook=settings[channel_reminders[0].guild_id].webhook)
+            for channel_id, channel_reminders in channels.items()
+        ))
+
+        self.prune_limits()
+        self.resolver.prune()
+        self.webhooks.prune()
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    async def guard_channel(self, channel_id: int, reminders: list[Reminder], result: DispatchResult, **kwargs):
+        """
+        Dispatch one channel, failing whichever of its reminders weren't
+        handled if it raises, so one channel can't abort the rest of the batch
+        """
+        try:
+            await self.dispatch_channel(channel_id, reminders, result, **kwargs)
+        except Exception as e:
+            log.exception('Error dispatching to channel %d', channel_id)
+            handled = {id(reminder) for reminder in result.completed + result.rescheduled}
+            handled.update(id(reminder) for reminder, _ in result.failed + result.rejected)
+            self.fail([reminder for reminder in reminders if id(reminder) not in handled], channel_id, e, result)
+
+    async def dispatch_channel(
+        self,
+        channel_id: int,
+        reminders: list[Reminder],
+        result: DispatchResult,
+        coalesce: bool = False,
+        webhook: bool = False
+    ):
+        """
+        Send the reminders for one channel in order, combining them if coalesce
+        is set and sending through the channel's webhook if webhook is set
+        """
+        channel = self.bot.get_channel(channel_id)
+        hook = None
+        if webhook and channel is not None:
+            try:
+                hook = await asyncio.wait_for(self.webhooks.get(channel), self.timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        # Webhooks have their own rate limit, separate from the bot's channel bucket
+        limits, rate = (self.webhook_limits, WEBHOOK_RATE) if hook else (self.channel_limits, CHANNEL_RATE)
+        limit = limits.get(channel_id)
+        if limit is None:
+            limit = limits[channel_id] = RateLimiter(*rate)
+
+        if coalesce and len(reminders) > 1:
+            guild = self.bot.get_guild(reminders[0].guild_id)
+            # Otherwise each reminder is handled as when not coalescing
+            if guild is not None and channel is not None:
+                await self.dispatch_coalesced(guild, channel, reminders, limit, result, hook)
+                return
+
+        for reminder in reminders:
+            try:
+                rescheduled = await self.limited(limit, self.deliver, reminder, channel_id, hook)
+            except (discord.errors.HTTPException, asyncio.TimeoutError, DeliveryFailed) as e:
+                self.fail([reminder], channel_id, e, result)
+            else:
+                (result.rescheduled if rescheduled else result.completed).append(reminder)
+
+    async def dispatch_coalesced(
+        self,
+        guild: discord.Guild,
+        channel: discord.TextChannel,
+        reminders: list[Reminder],
+        limit: RateLimiter,
+        result: DispatchResult,
+        webhook: discord.Webhook | None = None
+    ):
+        """Send the reminders for one channel combined into as few messages as possible"""
+        # Reminders only share a message with others whose authors may make the same mentions
+        groups: dict[tuple[bool, bool], list[tuple[Reminder, discord.Member]]] = {}
+        mentions: dict[tuple[bool, bool], discord.AllowedMentions] = {}
+        for reminder in reminders:
+            author = await self.resolver.member(guild, reminder.author_id)
+            if author is None:
+                self.fail([reminder], channel.id, DeliveryFailed('author_not_found'), result)
+                continue
+
+            allowed = self.resolver.allowed_mentions(channel, author)
+            key = (allowed.everyone, allowed.roles)
+            groups.setdefault(key, []).append((reminder, author))
+            mentions[key] = allowed
+
+        for key, group in groups.items():
+            messages = [reminder.message() for reminder, _ in group]
+            for run in pack(messages):
+                batch = [group[i] for i in run]
+                content = '\n'.join(messages[i] for i in run)
+                try:
+                    await self.limited(limit, self.send, channel, webhook, content, mentions[key])
+                except discord.errors.Forbidden:
+                    for reminder, author in batch:
+                        events.info('Missing permission to send reminder', **_fields(reminder, channel.id))
+                        metrics.reminders_failed.inc(reason='forbidden')
+                        await reminder.failure(channel, author)
+                except (discord.errors.HTTPException, asyncio.TimeoutError) as e:
+                    self.fail([reminder for reminder, _ in batch], channel.id, e, result)
+                    continue
+                else:
+                    for reminder, _ in batch:
+                        self.sent(reminder, channel.id)
+
+                for reminder, _ in batch:
+                    rescheduled = await self.advance(reminder)
+                    (result.rescheduled if rescheduled else result.completed).append(reminder)
+
+    async def send(
+        self,
+        channel: discord.TextChannel,
+        webhook: discord.Webhook | None,
+        content: str,
+        allowed_mentions: discord.AllowedMentions
+    ):
+        """Send a message through the channel's webhook if given, otherwise as the bot"""
+        if webhook is not None:
+            me = channel.guild.me
+            try:
+                await webhook.send(
+                    content, username=me.display_name, avatar_url=me.display_avatar.url,
+                    allowed_mentions=allowed_mentions)
+                return
+            except discord.errors.NotFound:
+                # Deleted since it was cached, so look it up again next time
+                self.webhooks.discard(channel.id)
+
+        await channel.send(content, allowed_mentions=allowed_mentions)
+
+    async def limited(self, limit: RateLimiter, func, *args, **kwargs):
+        """Call func under the channel's rate limit, a worker and the global rate limit"""
+        # Wait on the channel's bucket before taking a worker
+        metrics.rate_limit_wait.observe(await limit.acquire(), scope='channel')
+        async with self.workers:
+            metrics.rate_limit_wait.observe(await self.global_limit.acquire(), scope='global')
+            return await asyncio.wait_for(func(*args, **kwargs), self.timeout)
+
+    def fail(self, reminders: list[Reminder], channel_id: int, error: Exception, result: DispatchResult):
+        """Record reminders that failed to deliver because of the given error"""
+        failed = result.failed
+        if isinstance(error, DeliveryFailed):
+            reason = error.reason
+        elif isinstance(error, asyncio.TimeoutError):
+            reason = 'timeout'
+        elif isinstance(error, discord.errors.DiscordServerError):
+            reason = 'server_error'
+        elif isinstance(error, discord.errors.HTTPException) and error.status == 429:
+            reason = 'rate_limited'
+        elif isinstance(error, discord.errors.HTTPException):
+            # Any other error response means the message itself was refused
+            reason = f'http_{error.status}'
+            failed = result.rejected
+        else:
+            reason = 'error'
+
+        for reminder in reminders:
+            events.warning('Reminder failed to deliver', **_fields(reminder, channel_id), reason=reason)
+            metrics.reminders_failed.inc(reason=reason)
+            failed.append((reminder, reason))
+
+    def sent(self, reminder: Reminder, channel_id: int):
+        """Record a reminder that was sent"""
+        lag = time.time() - reminder.time
+        metrics.reminders_sent.inc()
+        metrics.dispatch_lag.observe(lag)
+        events.debug('Reminder sent', **_fields(reminder, channel_id), lag=round(lag, 3))
+
+    async def advance(self, reminder: Reminder) -> bool:
+        """Move a handled reminder to its next time, returning whether it repeats"""
+        if not reminder.interval:
+            return False
+
+        if reminder.timezone is None:
+            # Stored before reminders carried their guild's timezone
+            reminder.timezone = await data.get_timezone(reminder.guild_id)
+        # Occurrences missed during downtime are collapsed into this delivery
+        reminder.time = reminder.next_time(after=time.time())
+        return True
+
+    async def deliver(
+        self,
+        reminder: Reminder,
+        channel_id: int,
+        webhook: discord.Webhook | None = None
+    ) -> bool:
+        """
+        Execute a single reminder, returning whether it was moved to its next
+        time because it repeats
+
+        Raises DeliveryFailed if the reminder should be retried later
+        """
+        # Ensure still in guild
+        guild = self.bot.get_guild(reminder.guild_id)
+        if not guild:
+            events.info('Guild not found', **_fields(reminder, channel_id))
+            metrics.reminders_failed.inc(reason='guild_not_found')
+            await data.remove_guild(reminder.guild_id)
+            return False
+
+        # Check target channel exists
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            raise DeliveryFailed('channel_not_found')
+
+        # Check if author still in guild
+        author = await self.resolver.member(guild, reminder.author_id)
+        if author is None:
+            raise DeliveryFailed('author_not_found')
+
+        try:
+            await self.send(
+                channel, webhook, reminder.message(), self.resolver.allowed_mentions(channel, author))
+            self.sent(reminder, channel_id)
+        except discord.errors.Forbidden:
+            events.info('Missing permission to send reminder', **_fields(reminder, channel_id))
+            metrics.reminders_failed.inc(reason='forbidden')
+            await reminder.failure(channel, author)
+
+        return await self.advance(reminder)
+
+    def prune_limits(self):
+        """Forget rate limiters for channels that have fully recovered"""
+        for limits in (self.channel_limits, self.webhook_limits):
+            for channel_id in [k for k, v in limits.items() if v.idle()]:
+                del limits[channel_id]
+
+
+def _fields(reminder: Reminder, channel_id: int):
+    """Fields identifying a reminder in logs, leaving out its text"""
+    return {'reminder': reminder.id, 'guild': reminder.guild_id, 'channel': channel_id}
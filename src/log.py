@@ -0,0 +1,132 @@
+"""
+Structured logging, formatted and written off the event loop
+
+Records are put on a queue by the logging calls and formatted and written by
+a background thread, so a burst of reminders never blocks on stdout. Each
+record is one line of key=value pairs. Per reminder events are sampled, so
+they can be enabled in production without logging every reminder.
+"""
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+_listener: QueueListener | None = None
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formats a record as key=value pairs, including any fields passed as
+    `extra={'fields': {...}}`
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        created = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created))
+        parts = [
+            f'time={created}.{int(record.msecs):03d}Z',
+            f'level={record.levelname.lower()}',
+            f'logger={record.name}',
+            f'msg={_quote(record.getMessage())}',
+        ]
+        for key, value in getattr(record, 'fields', {}).items():
+            parts.append(f'{key}={_quote(value)}')
+        if record.exc_info:
+            parts.append(f'exc={_quote(self.formatException(record.exc_info))}')
+        return ' '.join(parts)
+
+
+def _quote(value) -> str:
+    value = str(value)
+    if not value or any(c in value for c in ' "=\n'):
+        return '"' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+    return value
+
+
+class EventLogger:
+    """
+    Logs events that happen once per reminder, keeping a random fraction of
+    those below WARNING
+
+    Events are sampled before a record is created, so dropped events cost
+    next to nothing.
+
+    Attributes
+    logger: logging.Logger
+        Logger the kept events are logged to
+    rate: float
+        Fraction of events below WARNING that are kept, between 0 and 1
+    """
+
+    def __init__(self, name: str, rate: float = 1.0):
+        self.logger = logging.getLogger(name)
+        self.rate = rate
+
+    def enabled(self, level: int) -> bool:
+        """Whether an event at the given level should be logged"""
+        return self.logger.isEnabledFor(level) and (level >= logging.WARNING or random.random() < self.rate)
+
+    def log(self, level: int, msg: str, **fields):
+        """Log an event with the given fields, if it is sampled"""
+        if self.enabled(level):
+            self.logger.log(level, msg, extra={'fields': fields})
+
+    def debug(self, msg: str, **fields):
+        self.log(logging.DEBUG, msg, **fields)
+
+    def info(self, msg: str, **fields):
+        self.log(logging.INFO, msg, **fields)
+
+    def warning(self, msg: str, **fields):
+        self.log(logging.WARNING, msg, **fields)
+
+
+# Events that happen once per reminder
+events = EventLogger('src.events')
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queues records without formatting them first
+
+    The listener runs in this process, so records don't need to be made
+    picklable, and all formatting is left to the listener's thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(stream=None):
+    """
+    Route all logging through a queue to a background writer
+
+    LOG_LEVEL sets the level of the bot's own loggers, and LOG_SAMPLE_RATE the
+    fraction of per reminder events kept when they are enabled.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(StructuredFormatter())
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(logging.WARNING)
+    logging.getLogger('src').setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+    events.rate = float(os.getenv('LOG_SAMPLE_RATE', '0.01'))
+
+    _listener = QueueListener(log_queue, handler)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Write out any queued records and stop the background writer"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,204 @@
+"""
+Metrics for capacity planning and alerting, in the Prometheus text format
+
+Set METRICS_PORT to serve them at /metrics. They are only served on
+localhost unless METRICS_HOST is also set.
+"""
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable
+
+# Histogram buckets in seconds, for quick calls and for reminder lateness
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LAG_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900, 3600)
+
+log = logging.getLogger(__name__)
+
+
+def _escape(value: str):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+class Metric:
+    """
+    A named family of samples, one per combination of label values
+
+    Attributes
+    name: str
+        Metric name, without any suffix
+    help: str
+        Description shown alongside the metric
+    labels: tuple[str, ...]
+        Names of the labels every sample must be given
+    """
+
+    type = 'untyped'
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple[str, ...], object] = {}
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def _format(self, key: tuple[str, ...], extra: tuple[tuple[str, str], ...] = ()):
+        pairs = (*zip(self.labels, key), *extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+    def samples(self):
+        """Yield (name, labels, value) for every sample"""
+        for key, value in self._values.items():
+            yield self.name, self._format(key), value
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        lines.extend(f'{name}{labels} {value}' for name, labels, value in self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """A total that only increases"""
+
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that can go up and down, either set directly or read when rendered"""
+
+    type = 'gauge'
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._callbacks: dict[tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def track(self, func: Callable[[], float], **labels):
+        """Read the value from func whenever the metrics are rendered"""
+        self._callbacks[self._key(labels)] = func
+
+    def samples(self):
+        yield from super().samples()
+        for key, func in self._callbacks.items():
+            yield self.name, self._format(key), func()
+
+
+class Histogram(Metric):
+    """
+    Counts of observations falling into each bucket, with their sum
+
+    Attributes
+    buckets: tuple[float, ...]
+        Ascending upper bounds of the buckets, excluding +Inf
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            # Per bucket counts including +Inf, then the sum
+            entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the body of a with statement"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, label: str):
+        """Decorator observing the duration of each call to a coroutine, labelled by its name"""
+        def decorator(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.time(**{label: func.__name__}):
+                    return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def samples(self):
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                yield f'{self.name}_bucket', self._format(key, (('le', str(bound)),)), cumulative
+            yield f'{self.name}_sum', self._format(key), total
+            yield f'{self.name}_count', self._format(key), cumulative
+
+
+class Metrics:
+    """All metrics recorded by the bot"""
+
+    def __init__(self):
+        self.tick_seconds = Histogram(
+            'reminderbot_tick_seconds', 'Time spent dispatching due reminders per scheduler tick')
+        self.reminders_due = Counter(
+            'reminderbot_reminders_due_total', 'Reminders claimed for dispatch')
+        self.reminders_sent = Counter(
+            'reminderbot_reminders_sent_total', 'Reminders sent successfully')
+        self.reminders_failed = Counter(
+            'reminderbot_reminders_failed_total', 'Reminders that could not be sent, by reason',
+            ('reason',))
+        self.reminders_dead = Counter(
+            'reminderbot_reminders_dead_total', 'Reminders moved to the dead-letter collection')
+        self.overdue_reminders = Gauge(
+            'reminderbot_overdue_reminders', 'Backlog of overdue reminders at the start of the last tick')
+        self.dispatch_lag = Histogram(
+            'reminderbot_dispatch_lag_seconds', 'Time between a reminder being due and being sent',
+            buckets=LAG_BUCKETS)
+        self.mongo_seconds = Histogram(
+            'reminderbot_mongo_seconds', 'Latency of database calls, by method', ('method',))
+        self.open_sessions = Gauge(
+            'reminderbot_open_sessions', 'Prompts and lists currently open', ('kind',))
+        self.rate_limit_wait = Histogram(
+            'reminderbot_rate_limit_wait_seconds', 'Time spent waiting on rate limits before sending',
+            ('scope',))
+
+        self._metrics = [value for value in vars(self).values() if isinstance(value, Metric)]
+        self._runner = None
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text format"""
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+
+    async def serve(self, port: int, host: str = '127.0.0.1'):
+        """Serve the metrics over HTTP at /metrics"""
+        from aiohttp import web
+
+        async def handle(request):
+            return web.Response(
+                body=self.render().encode(),
+                headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+        app = web.Application()
+        app.router.add_get('/metrics', handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        log.info('Serving metrics on %s:%d', host, port)
+
+
+metrics = Metrics()
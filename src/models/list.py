@@ -1,81 +1,97 @@
 """
-Reminder list UI using pycord's pages module
+Reminder list UI, fetching one page of reminders at a time
 """
+import math
 
 import discord
-from discord.ext import pages
 
 from src import constants
+from src.data import data
 from src.models.reminder import Reminder
 
-BUTTONS = [
-    pages.PaginatorButton('first',
-                          label='<<', style=discord.ButtonStyle.blurple, row=1),
-    pages.PaginatorButton('prev',
-                          label='<', style=discord.ButtonStyle.blurple, row=1),
-    pages.PaginatorButton('page_indicator',
-                          style=discord.ButtonStyle.gray, row=1, disabled=True),
-    pages.PaginatorButton('next',
-                          label='>', style=discord.ButtonStyle.blurple, row=1),
-    pages.PaginatorButton('last',
-                          label='>>', style=discord.ButtonStyle.blurple, row=1),
-]
+PAGE_SIZE = 5
 
+ALL_REMINDERS = 'Show all reminders'
+MY_REMINDERS = 'Show my reminders only'
 
-class ReminderList(pages.Paginator):
-    """Object representing a paginated reminder list"""
 
-    def __init__(self, ctx: discord.ApplicationContext, reminders: list[Reminder]):
-        self.ctx = ctx
-        self.reminders = list(enumerate(reminders))
-        self.my_reminders = [
-            r for r in self.reminders if r[1].author_id == ctx.author.id]
-
-        page_groups = [
-            ReminderListPageGroup('Show all reminders', self.reminders),
-            ReminderListPageGroup('Show my reminders only', self.my_reminders)
-        ]
-
-        view = discord.ui.View(ReminderListMenu(page_groups, self))
-
-        super().__init__(
-            pages=page_groups[0].pages,
-            custom_buttons=BUTTONS,
-            custom_view=view,
-            use_default_buttons=False,
-            disable_on_timeout=True,
-            timeout=60
-        )
+class ReminderList(discord.ui.View):
+    """
+    Object representing a paginated reminder list
 
-    async def interaction_check(self, interaction: discord.Interaction):
-        if interaction.user == self.user:
-            return True
+    Only the page being shown is held in memory, other pages are fetched
+    from the database as they are navigated to.
 
-        await interaction.response.send_message(
-            "This isn't your list! Go away!", ephemeral=True)
-        return False
-
-    async def on_timeout(self):
-        """Timeout message on list timeout"""
-        embed = discord.Embed(
-            color=constants.RED,
-            title='Reminder List Timed Out!'
-        )
-        await self.message.edit(embed=embed, view=None)
+    Attributes
+    ctx: ApplicationContext
+        Context of the command that opened this list
+    author_id: int
+        If set, only reminders by this user are shown
+    reminders: list[Reminder]
+        Reminders on the current page
+    page: int
+        Index of the current page
+    pages: int
+        Total number of pages
+    message: InteractionMessage
+        The message that displays this list
+    """
 
-    async def close(self):
-        """Stop and delete list"""
-        self.stop()
-        await self.message.delete()
+    def __init__(self, ctx: discord.ApplicationContext):
+        super().__init__(timeout=60)
+        self.ctx = ctx
+        self.author_id: int | None = None
+        self.reminders: list[Reminder] = []
+        self.page = 0
+        self.pages = 1
+
+    async def respond(self, interaction: discord.Interaction):
+        """Send the first page of the list"""
+        await self.load('first')
+        res = await interaction.respond(embed=self.embed(), view=self)
+        self.message = await res.original_response()
+
+    async def load(self, where: str):
+        """Fetch the 'first', 'prev', 'next' or 'last' page"""
+        count = await data.count_reminders(self.ctx.guild_id, self.author_id)
+        self.pages = max(1, math.ceil(count / PAGE_SIZE))
+
+        page = {
+            'first': 0,
+            'prev': self.page - 1,
+            'next': self.page + 1,
+            'last': self.pages - 1
+        }[where]
+        page = max(0, min(page, self.pages - 1))
+
+        if page == 0 or not self.reminders:
+            page = 0
+            reminders = await data.reminder_page(
+                self.ctx.guild_id, PAGE_SIZE, self.author_id)
+        elif page == self.pages - 1 and where != 'next':
+            reminders = await data.reminder_page(
+                self.ctx.guild_id, count - page * PAGE_SIZE, self.author_id, last=True)
+        elif page > self.page:
+            reminders = await data.reminder_page(
+                self.ctx.guild_id, PAGE_SIZE, self.author_id, after=self.reminders[-1])
+        else:
+            reminders = await data.reminder_page(
+                self.ctx.guild_id, PAGE_SIZE, self.author_id, before=self.reminders[0])
 
+        # Reminders may have been removed since the list was opened
+        if not reminders and page != 0:
+            await self.load('first')
+            return
 
-class ReminderListPage(pages.Page):
-    """Page of a reminder list"""
+        self.reminders = reminders
+        self.page = page
+        self.update_buttons()
 
-    def __init__(self, reminders: list[tuple[int, Reminder]] | None):
-        if reminders:
+    def embed(self):
+        """Generates an embed for the current page"""
+        if self.reminders:
             content = '\n'.join(
-                f'**{idx+1}:** {reminder}\n' for idx, reminder in reminders)
+                f'**`{reminder.id}`:** {reminder}\n' for reminder in self.reminders)
         else:
             content = 'Nothing to show here...'
 
@@ -84,61 +100,76 @@ class ReminderListPage(pages.Page):
             title='Reminder List',
             description=content
         )
-        embed.set_footer(text='Note: IDs may be inaccurate if reminders have '
-                              'been added/removed since this list was opened.')
+        embed.set_footer(text='Use /remove <id> to remove a reminder.')
+        return embed
+
+    def update_buttons(self):
+        """Update the page indicator and disable buttons that lead nowhere"""
+        self.first_button.disabled = self.prev_button.disabled = self.page == 0
+        self.next_button.disabled = self.last_button.disabled = self.page == self.pages - 1
+        self.page_indicator.label = f'{self.page + 1}/{self.pages}'
+
+    async def show(self, where: str, interaction: discord.Interaction):
+        """Navigate to a page and display it"""
+        await self.load(where)
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    @discord.ui.select(
+        placeholder='Showing all reminders...',
+        options=[
+            discord.SelectOption(label=ALL_REMINDERS, value=ALL_REMINDERS),
+            discord.SelectOption(label=MY_REMINDERS, value=MY_REMINDERS)
+        ],
+        row=0
+    )
+    async def filter_select(self, select: discord.ui.Select, interaction: discord.Interaction):
+        """Switch between all reminders and the user's own"""
+        if select.values[0] == ALL_REMINDERS:
+            select.placeholder = 'Showing all reminders...'
+            self.author_id = None
+        else:
+            select.placeholder = f"Showing {self.ctx.author.display_name}'s reminders..."
+            self.author_id = self.ctx.author.id
 
-        super().__init__(embeds=[embed])
+        await self.show('first', interaction)
 
+    @discord.ui.button(label='<<', style=discord.ButtonStyle.blurple, row=1)
+    async def first_button(self, button: discord.ui.Button, interaction: discord.Interaction):
+        await self.show('first', interaction)
 
-class ReminderListPageGroup(pages.PageGroup):
-    """PageGroup that represents a set of reminder"""
+    @discord.ui.button(label='<', style=discord.ButtonStyle.blurple, row=1)
+    async def prev_button(self, button: discord.ui.Button, interaction: discord.Interaction):
+        await self.show('prev', interaction)
 
-    def __init__(self, label: str, reminders: list[tuple[int, Reminder]]):
-        if reminders:
-            page_list = []
-            for i in range(0, len(reminders), 5):
-                page_list.append(ReminderListPage(reminders[i:i+5]))
-        else:
-            page_list = [ReminderListPage(None)]
-
-        super().__init__(
-            pages=page_list,
-            label=label,
-            description=None,
-            use_default_buttons=False,
-            custom_buttons=BUTTONS,
-        )
+    @discord.ui.button(label='1/1', style=discord.ButtonStyle.gray, row=1, disabled=True)
+    async def page_indicator(self, button: discord.ui.Button, interaction: discord.Interaction):
+        pass
+
+    @discord.ui.button(label='>', style=discord.ButtonStyle.blurple, row=1)
+    async def next_button(self, button: discord.ui.Button, interaction: discord.Interaction):
+        await self.show('next', interaction)
 
+    @discord.ui.button(label='>>', style=discord.ButtonStyle.blurple, row=1)
+    async def last_button(self, button: discord.ui.Button, interaction: discord.Interaction):
+        await self.show('last', interaction)
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        if interaction.user == self.ctx.author:
+            return True
 
-class ReminderListMenu(discord.ui.Select):
-    """Custom Select menu for the ReminderList"""
-
-    def __init__(self, page_groups: list[ReminderListPageGroup], paginator: ReminderList):
-        self.page_groups = page_groups
-        self.paginator = paginator
-        opts = [
-            discord.SelectOption(
-                label=page_group.label,
-                value=page_group.label
-            )
-            for page_group in self.page_groups
-        ]
-        super().__init__(placeholder='Showing all reminders...', options=opts)
-
-    async def callback(self, interaction: discord.Interaction):
-        selection = self.values[0]
-        if selection == 'Show all reminders':
-            self.placeholder = 'Showing all reminders...'
-            new_pages = self.page_groups[0].pages
-        else:  # 'Show my reminders'
-            name = self.paginator.user.display_name
-            self.placeholder = f"Showing {name}'s reminders..."
-            new_pages = self.page_groups[1].pages
-
-        await self.paginator.update(
-            pages=new_pages,
-            use_default_buttons=False,
-            custom_buttons=BUTTONS,
-            custom_view=self.paginator.custom_view,
-            interaction=interaction
+        await interaction.response.send_message(
+            "This isn't your list! Go away!", ephemeral=True)
+        return False
+
+    async def on_timeout(self):
+        """Timeout message on list timeout"""
+        embed = discord.Embed(
+            color=constants.RED,
+            title='Reminder List Timed Out!'
         )
+        await self.message.edit(embed=embed, view=None)
+
+    async def close(self):
+        """Stop and delete list"""
+        self.stop()
+        await self.message.delete()
@@ -75,15 +75,18 @@ class ReminderPrompt:
         self.view_.add_item(CancelButton(self))
         return self.view_
 
-    async def run(self):
-        """
-        Sets up initial state and runs prompt
-        Returns True after timeout, or False after natural end
-        """
+    async def open(self):
+        """Sets up initial state and sends prompt"""
         self.view_.clear_items()
         self.view_.add_item(InitialSelect(self))
         res = await self.ctx.respond(embed=self.embed(), view=self.view(no_back=True))
         self.message = await res.original_response()
+
+    async def wait(self):
+        """
+        Waits for the prompt to end
+        Returns True after timeout, or False after natural end
+        """
         return await self.view_.wait()
 
     async def restart(self):
@@ -0,0 +1,65 @@
+"""
+Registry of the prompts or lists currently open
+"""
+import asyncio
+import weakref
+from typing import Generic, TypeVar
+
+T = TypeVar('T')
+
+
+class SessionRegistry(Generic[T]):
+    """
+    Open sessions (prompts or lists), indexed by author and by message
+
+    Each author has at most one open session. Locks are per author, so
+    opening a session never waits on other users.
+    """
+
+    def __init__(self):
+        self._by_author: dict[int, T] = {}
+        self._by_message: dict[int, T] = {}
+        self._messages: dict[int, int] = {}
+        self._locks: weakref.WeakValueDictionary[int, asyncio.Lock] = weakref.WeakValueDictionary()
+
+    def lock(self, author_id: int) -> asyncio.Lock:
+        """Lock for opening or closing the given author's session"""
+        lock = self._locks.get(author_id)
+        if lock is None:
+            lock = self._locks[author_id] = asyncio.Lock()
+        return lock
+
+    def get(self, author_id: int) -> T | None:
+        """The given author's open session, if any"""
+        return self._by_author.get(author_id)
+
+    def from_message(self, message_id: int) -> T | None:
+        """The session displayed by the given message, if any"""
+        return self._by_message.get(message_id)
+
+    def add(self, author_id: int, session: T):
+        """Register a session as the given author's open session, replacing any other"""
+        # The replaced session's message no longer leads to an open session
+        message_id = self._messages.pop(author_id, None)
+        if message_id is not None:
+            self._by_message.pop(message_id, None)
+        self._by_author[author_id] = session
+
+    def bind(self, author_id: int, message_id: int):
+        """Record the message displaying the given author's session"""
+        session = self._by_author.get(author_id)
+        if session is not None:
+            self._by_message[message_id] = session
+            self._messages[author_id] = message_id
+
+    def remove(self, author_id: int, session: T):
+        """Unregister a session, if it is still the given author's open session"""
+        if self._by_author.get(author_id) is not session:
+            return
+        del self._by_author[author_id]
+        message_id = self._messages.pop(author_id, None)
+        if message_id is not None:
+            self._by_message.pop(message_id, None)
+
+    def __len__(self):
+        return len(self._by_author)
@@ -1,14 +1,35 @@
 """
 Reminder object
 """
+import logging
 from functools import total_ordering
 from datetime import datetime
+from operator import itemgetter
+from typing import Iterable
 from zoneinfo import ZoneInfo
 
 import discord
-from src import parsing
+from src import parsing, recurrence
 from src.models.prompt import ReminderPrompt
 
+log = logging.getLogger(__name__)
+
+# Reminders document fields, in the order of Reminder's constructor arguments.
+# Documents stored before OPTIONAL_FIELDS were added don't have them
+FIELDS = ('text', 'author_id', 'guild_id', 'channel_id', 'time', 'interval', '_id', 'timezone', 'attempts')
+OPTIONAL_FIELDS = ('timezone', 'attempts')
+_get_fields = itemgetter(*FIELDS[:-len(OPTIONAL_FIELDS)])
+
+
+def _decode(dic: dict):
+    """Constructor arguments from a reminders document"""
+    return (*_get_fields(dic), dic.get('timezone'), dic.get('attempts'))
+
+
+def shard_key(guild_id: int):
+    """Part of a guild ID that determines its shard, i.e. shard = shard_key % shard_count"""
+    return guild_id >> 22
+
 
 @total_ordering
 class Reminder:
@@ -28,8 +49,17 @@ class Reminder:
         POSIX timestamp of the time of the reminder
     interval: str
         String describing the recurrence interval
+    id: str
+        Short unique ID of the reminder, set once it has been stored
+    timezone: str
+        Timezone the recurrence is calculated in, that of the guild
+    attempts: int
+        Number of failed attempts to deliver the reminder
     """
 
+    # Thousands are loaded at once by lists and dispatch, so skip the __dict__
+    __slots__ = ('text', 'author_id', 'guild_id', 'channel_id', 'time', 'interval', 'id', 'timezone', 'attempts')
+
     def __init__(
         self,
         text: str = '',
@@ -37,7 +67,10 @@ class Reminder:
         guild_id: int = 0,
         channel_id: int = 0,
         time: int = 0,
-        interval: str = ''
+        interval: str = '',
+        id=None,
+        timezone: str | None = None,
+        attempts: int | None = 0
     ):
         self.text = text
         self.author_id = author_id
@@ -45,6 +78,9 @@ class Reminder:
         self.channel_id = channel_id
         self.time = time
         self.interval = interval
+        self.id = id
+        self.timezone = timezone
+        self.attempts = attempts or 0
 
     @classmethod
     def from_prompt(cls, prompt: ReminderPrompt):
@@ -71,50 +107,69 @@ class Reminder:
             guild_id=prompt.ctx.guild_id,
             channel_id=prompt.ctx.channel_id,
             time=int(time.timestamp()),
-            interval=interval
+            interval=interval,
+            timezone=prompt.timezone
         )
 
     @classmethod
     def from_dict(cls, dic: dict):
-        """Instantiate a reminder from a dict"""
-        return Reminder(
-            text=dic['text'],
-            author_id=dic['author_id'],
-            guild_id=dic['guild_id'],
-            channel_id=dic['channel_id'],
-            time=dic['time'],
-            interval=dic['interval']
-        )
+        """Instantiate a reminder from a reminders document"""
+        return cls(*_decode(dic))
 
-    def generate_repeat(self, tz: str = "UTC"):
-        """Create reminder that is the repeat of self"""
+    @classmethod
+    def from_dicts(cls, dics: Iterable[dict]):
+        """Instantiate reminders from many documents, e.g. a cursor"""
+        return [cls(*fields) for fields in map(_decode, dics)]
+
+    def to_dict(self):
+        """Convert to a reminders document"""
+        dic = {
+            'text': self.text,
+            'author_id': self.author_id,
+            'guild_id': self.guild_id,
+            'channel_id': self.channel_id,
+            'time': self.time,
+            'interval': self.interval,
+            'timezone': self.timezone,
+            'attempts': self.attempts,
+            'shard_key': shard_key(self.guild_id)
+        }
+        if self.id is not None:
+            dic['_id'] = self.id
+        return dic
+
+    def next_time(self, after: float | None = None) -> int:
+        """
+        Timestamp of the next occurrence of this reminder in its timezone
+
+        If `after` is given, this is the first occurrence later than that
+        timestamp, so occurrences missed while the bot was down are skipped
+        """
         if not self.interval:
             raise ValueError('This reminder has no repeat interval set')
 
-        time = parsing.add_interval(self.interval, datetime.fromtimestamp(self.time, tz=ZoneInfo(tz)))
-
-        return Reminder(
-            text=self.text,
-            author_id=self.author_id,
-            guild_id=self.guild_id,
-            channel_id=self.channel_id,
-            time=int(time.timestamp()),
-            interval=self.interval
-        )
+        interval = recurrence.compile_interval(self.interval)
+        start = datetime.fromtimestamp(self.time, tz=ZoneInfo(self.timezone or 'UTC'))
+        if after is None:
+            time = interval.add(start)
+        else:
+            time = interval.next_after(start, after)
+        return int(time.timestamp())
 
-    async def execute(self, channel: discord.TextChannel, author: discord.Member):
-        """Execute this reminder in given channel with author's allowed mentions"""
-        # Calculate the allowed mentions of the author
+    @staticmethod
+    def allowed_mentions(channel: discord.TextChannel, author: discord.Member):
+        """Calculate the mentions the author is allowed to make in the channel"""
         author_perms = channel.permissions_for(author)
-        allowed_mentions = discord.AllowedMentions(
+        return discord.AllowedMentions(
             users=True,
             everyone=author_perms.mention_everyone,
             roles=author_perms.mention_everyone
         )
 
-        await channel.send(f'<@{self.author_id}>\n> {self.text}',
-                           allowed_mentions=allowed_mentions)
-    
+    def message(self):
+        """Content of the message sent when this reminder goes off"""
+        return f'<@{self.author_id}>\n> {self.text}'
+
     async def failure(self, channel: discord.TextChannel, author: discord.Member):
         """DM user in case of failed reminder"""
         try:
@@ -124,8 +179,8 @@ class Reminder:
                 f'> {self.text}'
             )
         except discord.Forbidden as e:
-            print(f'The following reminder failed to send, and failed to notify author: {repr(self)}\n'
-                  f'The cause was: {e}')
+            log.info('Failed to notify author of failed reminder', extra={'fields': {
+                'reminder': self.id, 'guild': self.guild_id, 'author': self.author_id, 'error': e}})
 
     def __str__(self):
         """Discord syntax string representation for listing"""
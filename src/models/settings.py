@@ -0,0 +1,67 @@
+"""
+Guild settings object
+"""
+
+
+class GuildSettings:
+    """
+    Represents the settings of a guild
+
+    Attributes
+    guild_id: int
+        ID of the guild these settings belong to
+    timezone: str
+        Timezone that times entered in this guild are in
+    target: int
+        Channel ID that all reminders are sent to, if any
+    role: int
+        Role ID of the manager role, if any
+    coalesce: bool
+        Whether reminders sent to one channel at once are combined into fewer messages
+    webhook: bool
+        Whether reminders are sent through a webhook in their channel where possible
+    """
+
+    def __init__(
+        self,
+        guild_id: int,
+        timezone: str = 'UTC',
+        target: int | None = None,
+        role: int | None = None,
+        coalesce: bool = False,
+        webhook: bool = False
+    ):
+        self.guild_id = guild_id
+        self.timezone = timezone
+        self.target = target
+        self.role = role
+        self.coalesce = coalesce
+        self.webhook = webhook
+
+    @classmethod
+    def from_dict(cls, dic: dict):
+        """Instantiate settings from a guilds document"""
+        return GuildSettings(
+            guild_id=dic['_id'],
+            timezone=dic.get('timezone', 'UTC'),
+            target=dic.get('target'),
+            role=dic.get('role'),
+            coalesce=dic.get('coalesce', False),
+            webhook=dic.get('webhook', False)
+        )
+
+    def to_dict(self):
+        """Convert to a guilds document"""
+        return {
+            '_id': self.guild_id,
+            'timezone': self.timezone,
+            'target': self.target,
+            'role': self.role,
+            'coalesce': self.coalesce,
+            'webhook': self.webhook
+        }
+
+    def __repr__(self):
+        return (f'GuildSettings(guild_id={self.guild_id}, timezone={self.timezone}, '
+                f'target={self.target}, role={self.role}, coalesce={self.coalesce}, '
+                f'webhook={self.webhook})')
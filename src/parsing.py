@@ -1,20 +1,103 @@
 """
 Utility functions for parsing dates, times and intervals
 """
-import re
-from datetime import datetime, tzinfo
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 from zoneinfo import ZoneInfo
 
-from dateparser import parse
-from dateutil.relativedelta import relativedelta
-
-from src import constants
+from src import constants, recurrence
 
 
 def str_to_datetime(string: str, timezone: str):
     """Process a string and timezone to an aware datetime"""
-    string = re.sub(constants.TODAY, 'today', string)
-    string = re.sub(constants.TOMORROW, 'tomorrow', string)
+    string = normalise_datetime(string)
+
+    # With an explicit time, the fast path's result only changes when the date does
+    if constants.CLOCK_REGEX.search(string):
+        today = datetime.now(ZoneInfo(timezone)).date()
+        result = _cached_fast_parse(string, timezone, today)
+    else:
+        result = fast_parse(string, timezone)
+
+    # dateparser's results also depend on the time of day, e.g. '8pm' is
+    # today before 8pm and tomorrow after, so they are never cached
+    return result or dateparser_parse(string, timezone)
+
+
+def normalise_datetime(string: str):
+    """Lowercase, collapse whitespace and expand today/tomorrow shorthands"""
+    string = ' '.join(string.lower().split())
+    string = constants.TODAY_REGEX.sub('today', string)
+    return constants.TOMORROW_REGEX.sub('tomorrow', string)
+
+
+@lru_cache(maxsize=1024)
+def _cached_fast_parse(string: str, timezone: str, today: date):
+    """fast_parse memoised on the normalised string, timezone and current date"""
+    return fast_parse(string, timezone)
+
+
+def fast_parse(string: str, timezone: str):
+    """
+    Parse the most common date and time shapes without dateparser
+
+    Returns None for anything not understood, or whose meaning is ambiguous
+    """
+    match = constants.FAST_DATETIME_REGEX.match(string)
+    if not match:
+        return None
+    groups = match.groupdict()
+    tz = ZoneInfo(timezone)
+    now = datetime.now(tz)
+
+    # Time of day
+    if groups['meridiem']:
+        hour = int(groups['hour'])
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if groups['meridiem'] == 'pm' else 0)
+        minute = int(groups['minute'] or 0)
+    elif groups['hour24']:
+        hour = int(groups['hour24'])
+        minute = int(groups['minute24'])
+    else:
+        hour = minute = None
+    if hour is not None and (hour > 23 or minute > 59):
+        return None
+
+    # Day
+    if groups['relative']:
+        day = now + timedelta(days=groups['relative'] == 'tomorrow')
+        if hour is None:
+            # Relative days without a time keep the current time
+            return day
+        day = day.date()
+    elif groups['weekday']:
+        offset = (constants.WEEKDAYS[groups['weekday']] - now.weekday()) % 7
+        if offset == 0 or hour is None:
+            return None
+        day = now.date() + timedelta(days=offset)
+    else:
+        month = int(groups['month']) if groups['month'] else constants.MONTHS[groups['mname']]
+        year = groups['year'] or groups['myear']
+        try:
+            day = date(int(year) if year else now.year, month, int(groups['day'] or groups['mday']))
+            # Prefer dates from the future when no year is given
+            if not year and day < now.date():
+                day = day.replace(year=day.year + 1)
+        except ValueError:
+            return None
+        if not year and day == now.date():
+            return None
+
+    return datetime(day.year, day.month, day.day, hour or 0, minute or 0, tzinfo=tz)
+
+
+def dateparser_parse(string: str, timezone: str):
+    """Parse any string dateparser understands to an aware datetime"""
+    # Imported on first use as dateparser is slow to import
+    from dateparser import parse
+
     settings = {
         'DATE_ORDER': 'DMY',
         'TIMEZONE': timezone,
@@ -70,22 +153,9 @@ def normalise_relative(string: str):
     return result
 
 
-RELATIVE_UNITS = ["days", "weeks", "months", "years"]
 def add_interval(interval: str, dt: datetime) -> datetime:
     """
     Given a string describing an interval and a datetime, returns a new datetime
     that is `interval` after the original datetime
     """
-    tz: tzinfo = dt.tzinfo or ZoneInfo('UTC')
-
-    units_dict = constants.INTERVAL_REGEX.match(interval).groupdict()
-    units_dict = {k: (int(v) if v else 0) for k, v in units_dict.items()}
-
-    # Handle relative units by adding to the corresponding component
-    dt += relativedelta(**{k: units_dict[k] for k in RELATIVE_UNITS})
-
-    # Handle absolute units (seconds) by adding directly to the timestamp
-    delta = units_dict.get("hours", 0) * 3600 + units_dict.get("minutes", 0) * 60 + units_dict.get("seconds", 0)
-    dt = datetime.fromtimestamp(dt.timestamp() + delta, tz=tz)
-
-    return dt
+    return recurrence.compile_interval(interval).add(dt)
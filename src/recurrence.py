@@ -0,0 +1,106 @@
+"""
+Recurrence engine for repeating reminders
+
+An interval string is parsed once into an Interval, which can then step or
+expand occurrences without re-parsing. Calendar units (days and longer) are
+added in wall-clock time, so a daily reminder stays at the same local time
+across daylight saving changes. Hours, minutes and seconds are added to the
+timestamp, so they are exact durations.
+"""
+import heapq
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from zoneinfo import ZoneInfo
+
+from dateutil.relativedelta import relativedelta
+
+from src import constants
+
+CALENDAR_UNITS = ('years', 'months', 'weeks', 'days')
+
+UTC = ZoneInfo('UTC')
+
+
+class Interval:
+    """
+    A parsed recurrence interval
+
+    Attributes
+    calendar: relativedelta | None
+        Part of the interval added in wall-clock time, if any
+    seconds: int
+        Part of the interval added as a fixed number of seconds
+    """
+
+    __slots__ = ('calendar', 'seconds')
+
+    def __init__(self, calendar: relativedelta | None, seconds: int):
+        if not calendar and seconds <= 0:
+            raise ValueError('Interval must be positive')
+        self.calendar = calendar
+        self.seconds = seconds
+
+    def add(self, dt: datetime) -> datetime:
+        """Returns the datetime one interval after dt"""
+        tz = dt.tzinfo or UTC
+        if self.calendar:
+            dt += self.calendar
+        # Going through the timestamp also resolves wall-clock times skipped by DST
+        return datetime.fromtimestamp(dt.timestamp() + self.seconds, tz=tz)
+
+    def next_after(self, dt: datetime, after: float) -> datetime:
+        """Returns the first occurrence after dt that is later than the `after` timestamp"""
+        if not self.calendar:
+            count = max(1, int((after - dt.timestamp()) // self.seconds) + 1)
+            return datetime.fromtimestamp(dt.timestamp() + count * self.seconds, tz=dt.tzinfo or UTC)
+
+        # Calendar intervals are at least a day, so stepping is cheap
+        dt = self.add(dt)
+        while dt.timestamp() <= after:
+            dt = self.add(dt)
+        return dt
+
+    def expand(self, dt: datetime, count: int) -> list[int]:
+        """Returns the timestamps of the `count` occurrences following dt"""
+        if not self.calendar:
+            start = int(dt.timestamp())
+            return [start + self.seconds * i for i in range(1, count + 1)]
+
+        times = []
+        for _ in range(count):
+            dt = self.add(dt)
+            times.append(int(dt.timestamp()))
+        return times
+
+
+@lru_cache(maxsize=1024)
+def compile_interval(interval: str) -> Interval:
+    """Parse an interval string, as stored on reminders, into an Interval"""
+    match = constants.INTERVAL_REGEX.match(interval)
+    if not match:
+        raise ValueError(f'Invalid interval: {interval}')
+
+    units = {k: int(v) if v else 0 for k, v in match.groupdict().items()}
+    calendar = relativedelta(**{k: units[k] for k in CALENDAR_UNITS})
+    seconds = units['hours'] * 3600 + units['minutes'] * 60 + units['seconds']
+    return Interval(calendar or None, seconds)
+
+
+def upcoming(reminders: list, tz: str, limit: int) -> list[tuple[int, object]]:
+    """
+    Returns the next `limit` firings across the given recurring reminders as
+    (timestamp, reminder) pairs in order, expanding each in the given timezone
+
+    Only the `limit` soonest reminders can make up the result, so the rest
+    need not be passed in.
+    """
+    zone = ZoneInfo(tz)
+    streams = []
+    for i, reminder in enumerate(reminders):
+        # No one reminder can make up more than `limit` firings
+        start = datetime.fromtimestamp(reminder.time, tz=zone)
+        times = compile_interval(reminder.interval).expand(start, limit - 1)
+        streams.append([(reminder.time, i), *((time, i) for time in times)])
+
+    return [(time, reminders[i]) for time, i in islice(heapq.merge(*streams), limit)]
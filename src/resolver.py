@@ -0,0 +1,113 @@
+"""
+Resolves reminder authors in bulk at dispatch time, caching the results
+"""
+import asyncio
+import time
+from typing import Iterable
+
+import discord
+
+from src.models.reminder import Reminder
+
+# Seconds that resolved members and their allowed mentions are cached for
+TTL = 5 * 60
+
+# Maximum number of users in a single gateway member request
+CHUNK_SIZE = 100
+
+# Guilds with fewer missing members than this are fetched over REST, as
+# gateway member requests are throttled per shard and can take much longer
+QUERY_THRESHOLD = 3
+
+_MISSING = object()
+
+
+class MemberResolver:
+    """
+    Cache of guild members and the mentions they are allowed to make
+
+    Members that have left the guild are cached as None, so they are not
+    looked up again on every reminder.
+
+    Attributes
+    ttl: float
+        Seconds before a cached entry is looked up again
+    """
+
+    def __init__(self, ttl: float = TTL):
+        self.ttl = ttl
+        self._members: dict[tuple[int, int], tuple[float, discord.Member | None]] = {}
+        self._mentions: dict[tuple[int, int], tuple[float, discord.AllowedMentions]] = {}
+
+    def _get(self, cache: dict, key: tuple[int, int]):
+        """Return an unexpired cache entry, or _MISSING"""
+        entry = cache.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return _MISSING
+        return entry[1]
+
+    def _put(self, cache: dict, key: tuple[int, int], value):
+        cache[key] = (time.monotonic() + self.ttl, value)
+
+    async def resolve(self, guild: discord.Guild, user_ids: Iterable[int]):
+        """Resolve and cache the given members of a guild in as few requests as possible"""
+        missing = []
+        for user_id in set(user_ids):
+            if self._get(self._members, (guild.id, user_id)) is not _MISSING:
+                continue
+
+            member = guild.get_member(user_id)
+            if member is not None:
+                self._put(self._members, (guild.id, user_id), member)
+            else:
+                missing.append(user_id)
+
+        if len(missing) < QUERY_THRESHOLD:
+            await self._fetch_members(guild, missing)
+            return
+
+        for i in range(0, len(missing), CHUNK_SIZE):
+            chunk = missing[i:i + CHUNK_SIZE]
+            try:
+                members = await guild.query_members(user_ids=chunk, limit=len(chunk), cache=True)
+            except (asyncio.TimeoutError, discord.ClientException):
+                await self._fetch_members(guild, chunk)
+                continue
+
+            found = {member.id: member for member in members}
+            for user_id in chunk:
+                self._put(self._members, (guild.id, user_id), found.get(user_id))
+
+    async def _fetch_members(self, guild: discord.Guild, user_ids: list[int]):
+        """Fetch and cache members concurrently over REST"""
+        results = await asyncio.gather(
+            *(guild.fetch_member(user_id) for user_id in user_ids), return_exceptions=True)
+        for user_id, result in zip(user_ids, results):
+            if isinstance(result, discord.errors.NotFound):
+                self._put(self._members, (guild.id, user_id), None)
+            elif not isinstance(result, BaseException):
+                self._put(self._members, (guild.id, user_id), result)
+            # Other errors are left uncached, so the member is looked up again next time
+
+    async def member(self, guild: discord.Guild, user_id: int) -> discord.Member | None:
+        """Return a member, resolving them if they haven't been already, or None if they can't be"""
+        member = self._get(self._members, (guild.id, user_id))
+        if member is _MISSING:
+            await self.resolve(guild, [user_id])
+            member = self._get(self._members, (guild.id, user_id))
+        return None if member is _MISSING else member
+
+    def allowed_mentions(self, channel: discord.TextChannel, author: discord.Member) -> discord.AllowedMentions:
+        """Mentions a reminder by the author may make in the channel"""
+        mentions = self._get(self._mentions, (channel.id, author.id))
+        if mentions is _MISSING:
+            mentions = Reminder.allowed_mentions(channel, author)
+            self._put(self._mentions, (channel.id, author.id), mentions)
+        return mentions
+
+    def prune(self):
+        """Drop all expired entries"""
+        now = time.monotonic()
+        for cache in (self._members, self._mentions):
+            for key in [k for k, (expiry, _) in cache.items() if expiry < now]:
+                del cache[key]
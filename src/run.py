@@ -1,18 +1,36 @@
 """Main file to run bot from"""
-import os
+from src.log import setup_logging, shutdown_logging
+from src.startup import timer
 
-import discord
-import dotenv
+setup_logging()
 
-from src.data import data
-from src.bot import ReminderBot
+with timer.phase('imports'):
+    import os
 
-ping = data.db.command('ping')
-print('Connected to MongoDB', ping)
+    import discord
+    import dotenv
 
+    from src.bot import ReminderBot, ShardedReminderBot
+
+dotenv.load_dotenv()
 intents = discord.Intents.default()
 activity = discord.Activity(type=discord.ActivityType.listening, name="/help")
-client = ReminderBot(intents=intents, activity=activity)
 
-dotenv.load_dotenv()
-client.run(os.getenv('DISCORD_TOKEN'))
+# SHARD_COUNT is a number of shards or 'auto', SHARD_IDS optionally lists
+# the comma separated shards to run in this process
+shard_count = os.getenv('SHARD_COUNT')
+if shard_count:
+    shard_ids = os.getenv('SHARD_IDS')
+    client = ShardedReminderBot(
+        intents=intents,
+        activity=activity,
+        shard_count=None if shard_count == 'auto' else int(shard_count),
+        shard_ids=[int(i) for i in shard_ids.split(',')] if shard_ids else None
+    )
+else:
+    client = ReminderBot(intents=intents, activity=activity)
+
+try:
+    client.run(os.getenv('DISCORD_TOKEN'))
+finally:
+    shutdown_logging()
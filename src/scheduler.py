@@ -0,0 +1,79 @@
+"""
+In-memory scheduler that sleeps until the next reminder is due
+"""
+import asyncio
+import heapq
+from datetime import datetime, timezone
+
+from src.data import data
+from src.models.reminder import Reminder
+
+# Seconds of upcoming reminders to keep in memory
+HORIZON = 10 * 60
+
+
+def now() -> float:
+    """Current POSIX timestamp"""
+    return datetime.now(timezone.utc).timestamp()
+
+
+class ReminderScheduler:
+    """
+    Keeps the due times of upcoming reminders in a min-heap
+
+    Only reminders due before the horizon are held in memory. The heap is
+    reloaded from the database once the horizon is reached, so an idle bot
+    makes one small query per horizon rather than one per minute.
+
+    Attributes
+    horizon: int
+        Number of seconds of upcoming reminders to keep in memory
+    """
+
+    def __init__(self, horizon: int = HORIZON):
+        self.horizon = horizon
+        self._heap: list[int] = []
+        self._horizon_end = 0
+        self._wakeup = asyncio.Event()
+
+    def notify(self, reminder: Reminder):
+        """Schedule a newly added reminder, waking early if it is the next one due"""
+        self.schedule(reminder.time)
+
+    def schedule(self, time: int):
+        """Ensure the scheduler wakes at the given timestamp"""
+        if time >= self._horizon_end:
+            # Will be picked up by the next refill
+            return
+
+        if not self._heap or time < self._heap[0]:
+            self._wakeup.set()
+        heapq.heappush(self._heap, time)
+
+    async def refill(self):
+        """Reload all reminder times up until the next horizon"""
+        # Reminders added while the query is in flight are pushed onto the new heap
+        self._heap = []
+        self._horizon_end = int(now()) + self.horizon
+        self._heap.extend(await data.upcoming_times(self._horizon_end))
+        heapq.heapify(self._heap)
+
+    async def wait(self):
+        """Sleep until at least one reminder is due"""
+        while True:
+            current = now()
+            if current >= self._horizon_end:
+                await self.refill()
+
+            if self._heap and self._heap[0] <= current:
+                # Everything due is fetched at once, so drop all due entries
+                while self._heap and self._heap[0] <= current:
+                    heapq.heappop(self._heap)
+                return
+
+            deadline = self._heap[0] if self._heap else self._horizon_end
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), deadline - current)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,64 @@
+"""
+Prebuilt search index for autocomplete handlers
+"""
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+
+# Discord shows at most 25 autocomplete choices
+MAX_CHOICES = 25
+
+# Characters that start a new word within a name, e.g. America/New_York
+WORD_SEPARATORS = '/_- '
+
+
+class SearchIndex:
+    """
+    Case insensitive prefix and substring index over a fixed list of names
+
+    Results are ranked with prefix matches first, then matches at the start
+    of a word, then any other substring, alphabetically within each.
+    """
+
+    def __init__(self, names):
+        self._sorted = sorted({(name.lower(), name) for name in names})
+        self._keys = [key for key, _ in self._sorted]
+
+        # All keys joined, so a substring search is one scan of one string
+        self._haystack = '\n'.join(self._keys)
+        self._offsets = []
+        offset = 0
+        for key in self._keys:
+            self._offsets.append(offset)
+            offset += len(key) + 1
+
+        self.search = lru_cache(maxsize=4096)(self._search)
+
+    def _search(self, query: str, limit: int = MAX_CHOICES) -> list[str]:
+        """Return up to `limit` ranked names containing the query"""
+        query = query.lower()
+
+        # Prefix matches are a contiguous run of the sorted keys
+        lo = bisect_left(self._keys, query)
+        hi = bisect_left(self._keys, query + '\uffff')
+        ranked = list(range(lo, min(hi, lo + limit)))
+
+        if len(ranked) < limit and query:
+            word_starts = []
+            others = []
+            start = 0
+            while (pos := self._haystack.find(query, start)) != -1:
+                idx = bisect_right(self._offsets, pos) - 1
+                end = self._offsets[idx + 1] - 1 if idx + 1 < len(self._offsets) else len(self._haystack)
+                if not lo <= idx < hi:
+                    # Rank by the best match within this name
+                    while pos != -1 and self._haystack[pos - 1] not in WORD_SEPARATORS:
+                        pos = self._haystack.find(query, pos + 1, end)
+                    (word_starts if pos != -1 else others).append(idx)
+                start = end + 1
+            ranked.extend(word_starts)
+            ranked.extend(others)
+
+        return [self._sorted[idx][1] for idx in ranked[:limit]]
+
+    def __len__(self):
+        return len(self._keys)
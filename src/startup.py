@@ -0,0 +1,54 @@
+"""
+Timing of each phase of startup
+"""
+import logging
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """
+    Records how long each phase of startup takes
+
+    Phases may overlap, e.g. connecting to the database happens while
+    logging in to Discord, so the total is measured separately.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self._begun: dict[str, float] = {}
+        self.reported = False
+
+    def begin(self, name: str):
+        """Mark the start of a phase"""
+        self._begun[name] = time.perf_counter()
+
+    def end(self, name: str):
+        """Mark the end of a phase, if it was begun and hasn't already ended"""
+        if name in self._begun and name not in self.phases:
+            self.phases[name] = time.perf_counter() - self._begun[name]
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the body of a with statement as a phase"""
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def report(self):
+        """Log the breakdown of all phases, once"""
+        if self.reported:
+            return
+        self.reported = True
+
+        total = time.perf_counter() - self.start
+        breakdown = ', '.join(f'{name} {secs:.2f}s' for name, secs in self.phases.items())
+        log.info('Started in %.2fs (%s)', total, breakdown)
+
+
+timer = StartupTimer()
@@ -0,0 +1,76 @@
+"""
+Caches the webhook used to send reminders in each channel
+
+Messages sent through a webhook are rate limited per webhook rather than
+against the bot's own per-channel bucket, and reuse the bot's HTTP session.
+"""
+import time
+
+import discord
+
+# Seconds that a channel's webhook, or lack of one, is cached for
+TTL = 60 * 60
+
+# Name of the webhooks created by the bot
+WEBHOOK_NAME = 'Reminder Bot'
+
+# Discord error codes for a channel or guild already having the most webhooks allowed
+MAX_WEBHOOKS_CODES = (30007, 30058)
+
+_MISSING = object()
+
+
+class WebhookCache:
+    """
+    Cache of the bot's webhook in each channel, creating them as needed
+
+    Channels where the bot may not manage webhooks, or that have no room for
+    another, are cached as None, so reminders there are sent as normal
+    without asking again each time. Other errors aren't cached.
+
+    Attributes
+    ttl: float
+        Seconds before a cached entry is looked up again
+    """
+
+    def __init__(self, ttl: float = TTL):
+        self.ttl = ttl
+        self._webhooks: dict[int, tuple[float, discord.Webhook | None]] = {}
+
+    async def get(self, channel: discord.TextChannel) -> discord.Webhook | None:
+        """Return the bot's webhook in the channel, or None if it can't have one"""
+        entry = self._webhooks.get(channel.id, (0, _MISSING))
+        if entry[0] >= time.monotonic():
+            return entry[1]
+
+        try:
+            webhook = await self._find_or_create(channel)
+        except discord.errors.HTTPException as e:
+            if not isinstance(e, discord.errors.Forbidden) and e.code not in MAX_WEBHOOKS_CODES:
+                # Likely transient, so send as normal this time and look again next time
+                return None
+            webhook = None
+        self._webhooks[channel.id] = (time.monotonic() + self.ttl, webhook)
+        return webhook
+
+    async def _find_or_create(self, channel: discord.TextChannel) -> discord.Webhook | None:
+        """Look up the bot's webhook in the channel, creating one if there is none"""
+        me = channel.guild.me
+        if not channel.permissions_for(me).manage_webhooks:
+            return None
+
+        for webhook in await channel.webhooks():
+            # Only webhooks the bot created come with a token to send with
+            if webhook.user is not None and webhook.user.id == me.id and webhook.token:
+                return webhook
+        return await channel.create_webhook(name=WEBHOOK_NAME, reason='Sending reminders')
+
+    def discard(self, channel_id: int):
+        """Forget the webhook of a channel, e.g. after it was deleted"""
+        self._webhooks.pop(channel_id, None)
+
+    def prune(self):
+        """Drop all expired entries"""
+        now = time.monotonic()
+        for channel_id in [k for k, (expiry, _) in self._webhooks.items() if expiry < now]:
+            del self._webhooks[channel_id]
@@ -0,0 +1,41 @@
+"""
+Fixtures for tests that need a database
+
+These need a disposable MongoDB, e.g. `docker run -p 27017:27017 mongo`, at
+TEST_MONGODB_URL, and are skipped if none is reachable. Each test gets its
+own database, dropped afterwards.
+"""
+import os
+import secrets
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+MONGODB_URL = os.getenv('TEST_MONGODB_URL', 'mongodb://localhost:27017')
+
+
+@pytest.fixture(scope='session')
+def mongodb_url():
+    """URL of the test MongoDB, skipping the test if it can't be reached"""
+    client = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command('ping')
+    except PyMongoError:
+        pytest.skip(f'No MongoDB at {MONGODB_URL}')
+    finally:
+        client.close()
+    return MONGODB_URL
+
+
+@pytest.fixture
+def database(mongodb_url, monkeypatch):
+    """Name of a throwaway database, which MyMongoClient instances are pointed at"""
+    name = f'reminderbot_test_{secrets.token_hex(4)}'
+    monkeypatch.setenv('MONGODB_URL', mongodb_url)
+    monkeypatch.setenv('MONGODB_DB', name)
+    yield name
+
+    client = MongoClient(mongodb_url)
+    client.drop_database(name)
+    client.close()
@@ -0,0 +1,121 @@
+"""
+Tests that concurrent workers deliver each reminder exactly once
+
+Each worker is a separate process claiming reminders from the same
+database, as separate bot replicas would.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from collections import Counter
+
+from pymongo import MongoClient
+
+from src.models.reminder import Reminder
+
+WORKERS = 4
+REMINDERS = 2000
+BATCH_SIZE = 50
+
+# Seconds leases last for in these tests, instead of data.LEASE. Well over
+# the time workers take to start, so leases only expire when a test says so
+LEASE = 60
+
+
+def work(url: str, database: str, start, results, crash: bool = False):
+    """
+    Claim and deliver due reminders until there are none left, putting the
+    IDs delivered on the results queue
+
+    If crash is set, the worker claims one batch then exits without
+    delivering or completing it, leaving its leases to expire.
+    """
+    os.environ['MONGODB_URL'] = url
+    os.environ['MONGODB_DB'] = database
+    import src.data
+    src.data.LEASE = LEASE
+    client = src.data.MyMongoClient()
+
+    async def run():
+        delivered = []
+        async for batch in client.current_reminders(batch_size=BATCH_SIZE):
+            if crash:
+                break
+            # Stand-in for sending, so workers' claims interleave
+            await asyncio.sleep(0.01)
+            delivered.extend(reminder.id for reminder in batch)
+            await client.complete_reminders(batch)
+        return delivered
+
+    start.wait()
+    results.put(asyncio.run(run()))
+
+
+def run_workers(url: str, database: str, count: int = WORKERS, crash: bool = False) -> list[list[str]]:
+    """Run worker processes at once, returning the IDs delivered by each"""
+    ctx = multiprocessing.get_context('spawn')
+    start = ctx.Barrier(count)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=work, args=(url, database, start, results, crash)) for _ in range(count)]
+    for process in processes:
+        process.start()
+    delivered = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    return delivered
+
+
+def seed(url: str, database: str) -> list[str]:
+    """Insert reminders that are all due, returning their IDs"""
+    now = int(time.time())
+    reminders = [
+        Reminder(text=f'reminder {i}', author_id=10, guild_id=1 + i % 7, channel_id=100,
+                 time=now - REMINDERS + i, id=f'r{i:05}', timezone='UTC')
+        for i in range(REMINDERS)
+    ]
+    with MongoClient(url) as client:
+        client[database].reminders.insert_many([reminder.to_dict() for reminder in reminders])
+    return [reminder.id for reminder in reminders]
+
+
+def remaining(url: str, database: str) -> int:
+    with MongoClient(url) as client:
+        return client[database].reminders.count_documents({})
+
+
+def expire_leases(url: str, database: str):
+    """Move every lease's expiry into the past, as if LEASE seconds had passed"""
+    with MongoClient(url) as client:
+        client[database].reminders.update_many(
+            {'lease_until': {'$exists': True}}, {'$set': {'lease_until': int(time.time()) - 1}})
+
+
+def test_concurrent_workers_deliver_exactly_once(mongodb_url, database):
+    ids = seed(mongodb_url, database)
+
+    delivered = run_workers(mongodb_url, database)
+
+    counts = Counter(id for ids_ in delivered for id in ids_)
+    assert sorted(counts) == ids
+    assert set(counts.values()) == {1}
+    assert sum(1 for ids_ in delivered if ids_) > 1, 'workers did not run concurrently'
+    assert remaining(mongodb_url, database) == 0
+
+
+def test_expired_leases_are_delivered_exactly_once(mongodb_url, database):
+    ids = seed(mongodb_url, database)
+
+    # A worker claims a batch then dies, so the rest can't deliver it until its lease expires
+    assert run_workers(mongodb_url, database, count=1, crash=True) == [[]]
+    delivered = run_workers(mongodb_url, database)
+    assert remaining(mongodb_url, database) == BATCH_SIZE
+
+    expire_leases(mongodb_url, database)
+    delivered += run_workers(mongodb_url, database)
+
+    counts = Counter(id for ids_ in delivered for id in ids_)
+    assert sorted(counts) == ids
+    assert set(counts.values()) == {1}
+    assert remaining(mongodb_url, database) == 0
@@ -0,0 +1,49 @@
+"""
+Tests that slow database queries don't block the event loop
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+from src.data import MyMongoClient
+
+# Seconds each stand-in query blocks its thread for
+QUERY_SECONDS = 0.5
+
+
+class SlowCollection:
+    """Stand-in for a pymongo collection whose queries block like a slow round trip"""
+
+    def find_one(self, query: dict, *args, **kwargs):
+        time.sleep(QUERY_SECONDS)
+        return {'_id': query['_id'], 'timezone': 'Australia/Sydney'}
+
+
+def test_slow_query_does_not_block_interactions(monkeypatch):
+    monkeypatch.setenv('MONGODB_DB', 'reminderbot')
+    client = MyMongoClient()
+    client._client = {'reminderbot': SimpleNamespace(guilds=SlowCollection())}
+
+    async def interactions(done: asyncio.Event):
+        """Stand-in for other users' interactions, returning the longest gap between them"""
+        longest = 0.0
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            longest = max(longest, now - last)
+            last = now
+        return longest
+
+    async def main():
+        done = asyncio.Event()
+        other = asyncio.create_task(interactions(done))
+        await asyncio.sleep(0.05)
+        timezone = await client.get_timezone(1)
+        done.set()
+        return timezone, await other
+
+    timezone, longest_gap = asyncio.run(main())
+    assert timezone == 'Australia/Sydney'
+    # Had the query run on the event loop, nothing else could run until it finished
+    assert longest_gap < QUERY_SECONDS / 5
@@ -0,0 +1,145 @@
+"""
+Tests that every data layer query is served by one of INDEXES
+
+Each data method is run with the commands it sends recorded, and each
+recorded query is explained to check that its winning plan has no COLLSCAN.
+all_guilds, backfill_shard_keys and unfiltered dead letter listings scan
+every document by design, and are left out.
+"""
+import asyncio
+import time
+
+import pytest
+from pymongo import MongoClient, monitoring
+
+from src.data import MyMongoClient
+from src.models.reminder import Reminder
+
+GUILD = 1
+AUTHOR = 10
+
+# Commands that read or write existing documents, and so can be explained
+EXPLAINABLE = {'find', 'aggregate', 'count', 'distinct', 'findAndModify', 'update', 'delete'}
+
+# Fields the driver adds to commands that don't belong in an explained command
+DRIVER_FIELDS = {'lsid', '$db', '$clusterTime', '$readPreference', 'txnNumber',
+                 'apiVersion', 'apiStrict', 'apiDeprecationErrors', 'readConcern', 'writeConcern'}
+
+
+class CommandRecorder(monitoring.CommandListener):
+    """Records the commands sent by a client"""
+
+    def __init__(self):
+        self.commands: list[dict] = []
+
+    def started(self, event):
+        if event.command_name in EXPLAINABLE:
+            self.commands.append(dict(event.command))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def explainable(command: dict) -> list[dict]:
+    """Split a recorded command into commands that can each be explained"""
+    command = {k: v for k, v in command.items() if k not in DRIVER_FIELDS}
+    # Writes can only be explained one statement at a time
+    for name, statements in (('update', 'updates'), ('delete', 'deletes')):
+        if name in command:
+            return [{**command, statements: [statement]} for statement in command[statements]]
+    return [command]
+
+
+def stages(plan) -> list[str]:
+    """Every stage in a plan or explain output"""
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in stages(item)]
+    if not isinstance(plan, dict):
+        return []
+    found = [plan['stage']] if isinstance(plan.get('stage'), str) else []
+    return found + [stage for key, value in plan.items() if key != 'rejectedPlans' for stage in stages(value)]
+
+
+def seed(client: MyMongoClient) -> list[Reminder]:
+    """Insert enough reminders and dead letters for every query to have data to plan over"""
+    now = int(time.time())
+    reminders = [
+        Reminder(
+            text=f'reminder {i}',
+            author_id=AUTHOR + i % 3,
+            guild_id=GUILD + i % 4,
+            channel_id=100,
+            time=now + (i - 50) * 60,
+            interval='1 day' if i % 5 == 0 else None,
+            id=f'r{i:04}',
+            timezone='UTC'
+        )
+        for i in range(200)
+    ]
+    client.db.reminders.insert_many([reminder.to_dict() for reminder in reminders])
+    client.db.dead_reminders.insert_many([
+        {**reminder.to_dict(), 'reason': 'channel_not_found', 'failed_at': now}
+        for reminder in reminders[:20]
+    ])
+    client.db.guilds.insert_many([{'_id': GUILD + i, 'timezone': 'UTC'} for i in range(4)])
+    return reminders
+
+
+def sharded(client: MyMongoClient):
+    client.set_shards(4, [1])
+    return client.claim_reminders(int(time.time()), 10)
+
+
+QUERIES = {
+    'get_reminder': lambda c, r: c.get_reminder(GUILD, r[0].id),
+    'remove_reminder': lambda c, r: c.remove_reminder(r[0]),
+    'remove_reminder_by_id': lambda c, r: c.remove_reminder_by_id(GUILD, r[4].id, AUTHOR),
+    'load_settings': lambda c, r: c._load_settings(GUILD),
+    'update_settings': lambda c, r: c._update_settings(GUILD, role=5),
+    'warm_settings': lambda c, r: c.warm_settings([GUILD, GUILD + 1]),
+    'set_timezone': lambda c, r: c.set_timezone(GUILD, 'Australia/Sydney'),
+    'reminder_page': lambda c, r: c.reminder_page(GUILD, 10),
+    'reminder_page_after': lambda c, r: c.reminder_page(GUILD, 10, after=r[40]),
+    'reminder_page_before': lambda c, r: c.reminder_page(GUILD, 10, before=r[80]),
+    'reminder_page_last': lambda c, r: c.reminder_page(GUILD, 10, last=True),
+    'reminder_page_author': lambda c, r: c.reminder_page(GUILD, 10, author_id=AUTHOR, after=r[0]),
+    'count_reminders': lambda c, r: c.count_reminders(GUILD),
+    'count_reminders_author': lambda c, r: c.count_reminders(GUILD, AUTHOR),
+    'next_recurring': lambda c, r: c.next_recurring(GUILD, 10),
+    'upcoming_times': lambda c, r: c.upcoming_times(int(time.time()) + 3600),
+    'claim_reminders': lambda c, r: c.claim_reminders(int(time.time()), 10),
+    'claim_reminders_newest': lambda c, r: c.claim_reminders(int(time.time()), 10, newest_first=True),
+    'claim_reminders_sharded': lambda c, r: sharded(c),
+    'count_overdue': lambda c, r: c.count_overdue(int(time.time())),
+    'complete_reminders': lambda c, r: c.complete_reminders(r[:3], r[5:6], [(r[3], 'timeout', 60)]),
+    'dead_letter': lambda c, r: c.dead_letter([(r[1], 'author_not_found')]),
+    'dead_letters': lambda c, r: c.dead_letters(GUILD, limit=10),
+    'dead_letters_reason': lambda c, r: c.dead_letters(reason='channel_not_found', limit=10),
+    'count_dead_letters': lambda c, r: c.count_dead_letters(GUILD),
+    'replay_dead_letters': lambda c, r: c.replay_dead_letters(GUILD),
+    'replay_dead_letters_ids': lambda c, r: c.replay_dead_letters(ids=[r[2].id]),
+    'remove_guild': lambda c, r: c.remove_guild(GUILD),
+}
+
+
+@pytest.mark.parametrize('name', QUERIES)
+def test_query_uses_index(database, mongodb_url, name):
+    recorder = CommandRecorder()
+    client = MyMongoClient()
+    client._client = MongoClient(mongodb_url, event_listeners=[recorder])
+    asyncio.run(client.ensure_indexes())
+    reminders = seed(client)
+
+    recorder.commands.clear()
+    asyncio.run(QUERIES[name](client, reminders))
+    assert recorder.commands, f'{name} sent no queries'
+
+    for command in recorder.commands:
+        for explained in explainable(command):
+            plan = client.db.command('explain', explained, verbosity='queryPlanner')
+            assert 'COLLSCAN' not in stages(plan), f'{name} scans the collection for {explained}'
+
+    client._client.close()